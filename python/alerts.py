@@ -0,0 +1,123 @@
+import threading
+import time
+
+
+# 푸시 알림을 보내는 위험 소음 라벨
+DANGER_LABELS = {
+    "Siren": "사이렌 소리",
+    "Car horn": "경적 소리",
+    "Bark": "개 짖는 소리",
+}
+
+ALERT_TITLE = "위험 소음 감지"
+
+
+class LabelState:
+    def __init__(self):
+        self.events = 0          # 지금까지 들어온 감지 횟수
+        self.sent = 0            # 실제로 보낸 알림 수
+        self.suppressed = 0      # 억제한 감지 횟수 (누적)
+        self.pending = 0         # 마지막 알림 이후 억제되어 아직 보고되지 않은 횟수
+        self.last_sent = None
+
+
+# 같은 라벨의 반복 알림 병합 / 속도 제한
+# 라벨마다 window 초에 한 번만 알림을 보내고, 그 사이의 감지는 세어 두었다가
+# 다음 알림(또는 flush)에 "최근 N초 동안 M회" 로 합쳐서 보낸다.
+class AlertCoalescer:
+    def __init__(self, window=30.0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _state(self, label):
+        if label not in self._states:
+            self._states[label] = LabelState()
+        return self._states[label]
+
+    def _message(self, label, count, elapsed=None):
+        name = DANGER_LABELS[label]
+        if count > 1 and elapsed and int(round(elapsed)) > 0:
+            return f'{name}가 최근 {int(round(elapsed))}초 동안 {count}회 감지되었습니다!'
+        if count > 1:
+            return f'{name}가 {count}회 감지되었습니다!'
+        return f'{name}가 감지되었습니다!'
+
+    # 감지 이벤트 평가. 지금 보내야 하면 알림 본문을, 억제하면 None 을 돌려준다.
+    # span: 한 번에 들어온 count 건의 측정 시각 범위(초). 억제해 둔 건이 없으면 이 범위만 기간으로 쓴다.
+    def evaluate(self, label, count=1, now=None, span=None):
+        return self.reserve(label, count, now, span)[0]
+
+    # evaluate 와 같지만 되돌릴 수 있도록 (본문, 토큰) 을 돌려준다.
+    # 이벤트와 같은 트랜잭션에서 outbox 에 넣을 때 사용하고, commit 이 실패하면 release(토큰) 을 호출한다.
+    def reserve(self, label, count=1, now=None, span=None):
+        if label not in DANGER_LABELS or count <= 0:
+            return None, None
+        now = self.clock() if now is None else now
+        with self._lock:
+            state = self._state(label)
+            state.events += count
+            if state.last_sent is not None and now - state.last_sent < self.window:
+                state.pending += count
+                state.suppressed += count
+                return None, (label, count, False, None, 0)
+            token = (label, count, True, state.last_sent, state.pending)
+            total = state.pending + count
+            # 억제해 둔 건은 마지막 알림 이후에 들어온 것
+            elapsed = span
+            if state.pending and state.last_sent is not None:
+                elapsed = max(now - state.last_sent, span or 0)
+            state.pending = 0
+            state.last_sent = now
+            state.sent += 1
+            return self._message(label, total, elapsed), token
+
+    # 저장에 실패한 감지 이벤트의 평가를 되돌린다 (보낸 것으로 기록한 알림은 보내지 않은 것으로)
+    def release(self, token):
+        if token is None:
+            return
+        label, count, sent, last_sent, pending = token
+        with self._lock:
+            state = self._state(label)
+            state.events -= count
+            if sent:
+                state.sent -= 1
+                state.last_sent = last_sent
+                state.pending += pending
+            else:
+                state.pending = max(state.pending - count, 0)
+                state.suppressed -= count
+
+    # 창이 끝났는데 보고되지 않은 억제 건이 있으면 합쳐서 알림 본문 목록을 돌려준다
+    def flush(self, now=None):
+        now = self.clock() if now is None else now
+        messages = []
+        with self._lock:
+            for label, state in self._states.items():
+                # release 로 마지막 알림이 없어졌으면 억제된 건을 바로 보낸다
+                if state.pending and (state.last_sent is None or now - state.last_sent >= self.window):
+                    elapsed = now - state.last_sent if state.last_sent is not None else None
+                    messages.append(self._message(label, state.pending, elapsed))
+                    state.pending = 0
+                    state.last_sent = now
+                    state.sent += 1
+        return messages
+
+    def state(self):
+        now = self.clock()
+        with self._lock:
+            return {
+                "window_seconds": self.window,
+                "labels": {
+                    label: {
+                        "events": state.events,
+                        "sent": state.sent,
+                        "suppressed": state.suppressed,
+                        "pending": state.pending,
+                        "seconds_since_sent": round(now - state.last_sent, 1) if state.last_sent is not None else None,
+                        "suppressing": state.last_sent is not None and now - state.last_sent < self.window,
+                    }
+                    for label, state in self._states.items()
+                },
+            }
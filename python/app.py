@@ -1,27 +1,34 @@
-from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Request, File, UploadFile, Form, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from typing_extensions import Annotated
 import requests
-import librosa
-import librosa.display
-from sklearn.preprocessing import LabelEncoder
-from keras.models import load_model
-import pandas as pd
 import numpy as np
 import os
 from starlette.requests import Request
-from database import db_conn
+from database import async_db_conn
 from models import Realtime_log, User_info, Notice_board, Push_alert
+from noise_log import parse_timemap, noise_query
+from rollup import apply_rollup, query_rollups, GRANULARITIES
+from streaming import stream_rows, keyset_page
+from notice_cache import NoticeCache, NoticeItem, notice_to_dict, conditional_response
 from dotenv import load_dotenv
-from pydantic import BaseModel
-from sqlalchemy import desc
+from pydantic import BaseModel, Field
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-import json
 from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from typing import Optional
 from urllib.parse import unquote_plus
 from google.oauth2 import service_account
 from google.auth.transport.requests import Request as GoogleAuthRequest
+from push import FcmDispatcher
+from token_cache import TokenCache
+from subscribers import SubscriberCache
+from outbox import NotificationOutbox
+from alerts import AlertCoalescer, ALERT_TITLE
 
 # BASE_DIR 설정
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.relpath("./")))
@@ -39,15 +46,26 @@ YOUR_CLIENT_ID = os.getenv("YOUR_CLIENT_ID")
 YOUR_CLIENT_SECRET = os.getenv("YOUR_CLIENT_SECRET")
 HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 FASTAPI = os.getenv("FASTAPI")
-FCM_API_URL = os.getenv("FCM_API_URL")
+FCM_API_URL = os.getenv("FCM_API_URL", "https://fcm.googleapis.com/v1/projects/soundproject-26e1d/messages:send")
 
 app = FastAPI()
 
-db = db_conn()
-session = db.sessionmaker()
+db = async_db_conn()
+
+# 요청 단위 비동기 세션
+SessionDep = Annotated[AsyncSession, Depends(db.get_session)]
+
+@app.on_event("shutdown")
+async def dispose_db():
+    await db.dispose()
+
+@app.get("/dbStats")
+async def get_db_stats():
+    return {"pool": db.pool_status()}
 
 
 def extract_feature(file_name):
+    import librosa
     print("Starting feature extraction for:", file_name)  
     audio_data, sample_rate = librosa.load(file_name, sr=None, res_type='kaiser_fast')
 
@@ -87,198 +105,278 @@ class NoticeUpdate(BaseModel):
     content: str
     file: Optional[str] = None
 
-class NoticeItem(BaseModel):
-    no: int
-    title: str
-    content: str | None
-    date: datetime
-    file: str | None
-
-    class Config:
-        orm_mode = True
-
 from typing import List
 
+# 공지는 거의 바뀌지 않으므로 ETag 계산용 메타데이터(no, title, 내용 해시)만 캐시해 두고 쓰기 때 무효화한다
+# 내용 해시는 DB 에서 계산하므로 본문(base64 이미지 포함)은 워커 메모리에 올리지 않는다
+def notice_digest():
+    return func.sha1(func.concat(
+        func.sha1(Notice_board.title),
+        func.coalesce(func.sha1(Notice_board.content), '-'),
+        func.coalesce(Notice_board.date, '-'),
+        func.coalesce(func.sha1(Notice_board.file), '-'),
+    ))
+
+async def load_notices():
+    async with db.sessionmaker() as notice_session:
+        rows = (await notice_session.execute(
+            select(Notice_board.no, Notice_board.title, notice_digest()))).all()
+        return [{"no": no, "title": title, "digest": digest} for no, title, digest in rows]
+
+notice_cache = NoticeCache(load_notices, ttl=float(os.getenv("NOTICE_CACHE_TTL", 60)))
+
+@app.get("/noticeCacheStats")
+async def get_notice_cache_stats():
+    return notice_cache.stats()
+
+# limit 을 주면 키셋 페이지({"items", "next_cursor"}), 없으면 전체를 스트리밍 (format=json|ndjson)
+# 모든 공지 조회는 ETag / Last-Modified 를 붙이고, 바뀌지 않았으면 DB 를 읽지 않고 304 를 돌려준다
 @app.get("/noticeList", response_model=List[NoticeItem])
-async def get_notice_list():
+async def get_notice_list(request: Request, session: SessionDep,
+                          limit: Optional[int] = Query(None, ge=1, le=1000),
+                          after: Optional[int] = None,
+                          format: str = "json"):
     try:
-        query = session.query(Notice_board).all()
-        return query
+        snapshot = await notice_cache.get()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    if limit is not None:
+        async def page():
+            page = await keyset_page(session, select(Notice_board), Notice_board.no, after, limit, notice_to_dict)
+            return JSONResponse(jsonable_encoder(page))
+        return await conditional_response(notice_cache, request, page,
+                                          snapshot.page_etag(after, limit), snapshot.last_modified)
+
+    async def rows():
+        return stream_rows(db.sessionmaker,
+                           select(Notice_board).order_by(Notice_board.no),
+                           notice_to_dict, format)
+    return await conditional_response(notice_cache, request, rows,
+                                      snapshot.list_etag(format), snapshot.last_modified)
 
 @app.get("/noticeFirst")
-async def get_notice_first():
-    query = session.query(Notice_board.title).order_by(desc(Notice_board.no)).first()
-    return {"title": query[0]}
+async def get_notice_first(request: Request):
+    snapshot = await notice_cache.get()
+    first = snapshot.first()
+    if first is None:
+        raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
+    return await conditional_response(notice_cache, request, *first, snapshot.last_modified)
 
 @app.get("/noticeContent/{notice_no}", response_model=NoticeItem)
-async def get_notice_content(notice_no: int):
+async def get_notice_content(notice_no: int, request: Request, session: SessionDep):
     try:
-        query = session.query(Notice_board).filter(Notice_board.no == notice_no).first()
-        
-        if query is None:
-            raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
-            
-        return query
+        snapshot = await notice_cache.get()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    etag = snapshot.item_etag(notice_no)
+    if etag is None:
+        # 다른 워커에서 등록된 공지는 TTL 동안 캐시에 없으므로, DB 에 있으면 캐시를 다시 읽는다
+        if await session.get(Notice_board, notice_no) is None:
+            raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
+        notice_cache.invalidate()
+        snapshot = await notice_cache.get()
+        etag = snapshot.item_etag(notice_no)
+        if etag is None:
+            raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
+
+    async def item():
+        row = await session.get(Notice_board, notice_no)
+        if row is None:
+            raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
+        return JSONResponse(jsonable_encoder(notice_to_dict(row)))
+    return await conditional_response(notice_cache, request, item, etag, snapshot.last_modified)
 
 @app.post("/noticeInsert")
-async def save_notice_data(notice: NoticeCreate):
+async def save_notice_data(notice: NoticeCreate, session: SessionDep):
     insert = Notice_board(title=notice.title, content=notice.content, file=notice.file)
     session.add(insert)
-    session.commit()
-    session.refresh(insert)
+    outbox.enqueue(session, "공지사항 업데이트", "새로운 공지사항이 업로드 되었습니다!")
+    await session.commit()
+    await session.refresh(insert)
+    notice_cache.invalidate()
+    outbox.notify()
     result = {"notice_no": insert.no}
     
-    access_token = get_access_token()
-    
-    url = FCM_API_URL
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json',
-    }
-
-    failed_tokens = []
-    
-    tokens = session.query(Push_alert.token).filter(Push_alert.permission == 'yes').all()
-    
-    if not tokens:
-        raise HTTPException(status_code=404, detail="No tokens found in the database")
-
-    tokens = [token[0] for token in tokens]
-    
-    for token in tokens:
-        message = {
-            "message": {
-                "token": token,
-                "notification": {
-                    "title": "공지사항 업데이트",
-                    "body": "새로운 공지사항이 업로드 되었습니다!"
-                }
-            }
-        }
-
-        response = requests.post(url, headers=headers, json=message)
-        
-        try:
-            response_data = response.json()
-            print("response_data:", response_data)
-        except ValueError as e:
-            raise HTTPException(status_code=response.status_code, detail=f"Invalid JSON response: {response.text}")
-        
-        if response.status_code != 200:
-            failed_tokens.append(token)
-    
-    if failed_tokens:
-        raise HTTPException(status_code=400, detail=f"Failed to send notification to tokens: {failed_tokens}")
-    
     return result
 
 
-@app.put("/noticeUpdate/{notice_no}")
-async def update_notice_data(notice_no: int, notice: NoticeUpdate):
-    update = session.query(Notice_board).filter(Notice_board.no == notice_no).first()
+# 수정/삭제는 해당 공지 한 건만 돌려준다
+@app.put("/noticeUpdate/{notice_no}", response_model=NoticeItem)
+async def update_notice_data(notice_no: int, notice: NoticeUpdate, session: SessionDep):
+    update = await session.get(Notice_board, notice_no)
+    if update is None:
+        raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
     update.title = notice.title
     update.content = notice.content
     update.file = notice.file
-    session.commit()
-    result = session.query(Notice_board).all()
-    return result
-
-@app.delete("/noticeDelete/{notice_no}")
-async def delete_notice_data(notice_no: int):
-    delete = session.query(Notice_board).filter(Notice_board.no == notice_no).first()
-    session.delete(delete)
-    session.commit()
-    result = session.query(Notice_board).all()
-    return result
-
-
+    await session.commit()
+    notice_cache.invalidate()
+    return update
+
+@app.delete("/noticeDelete/{notice_no}", response_model=NoticeItem)
+async def delete_notice_data(notice_no: int, session: SessionDep):
+    delete = await session.get(Notice_board, notice_no)
+    if delete is None:
+        raise HTTPException(status_code=404, detail="공지사항을 찾을 수 없습니다")
+    await session.delete(delete)
+    await session.commit()
+    notice_cache.invalidate()
+    return delete
+
+
+# 컬럼 크기에 맞춰 검증한다 (/realtimeInsertBatch 의 INSERT IGNORE 가 긴 값을 잘라서 넣지 않도록)
 class RealtimeInsert(BaseModel):
-    timemap: str
-    label: str
-    decibel: int
+    timemap: str = Field(max_length=40)
+    label: str = Field(max_length=20)
+    decibel: int = Field(ge=-32768, le=32767)
 
 @app.post("/realtimeInsert")
-async def save_realtime_data(realtime: RealtimeInsert):
+async def save_realtime_data(realtime: RealtimeInsert, session: SessionDep):
     print("realtime: ", realtime.timemap, realtime.label, realtime.decibel)
     
-    insert = Realtime_log(timemap=realtime.timemap, label=realtime.label, decibel=realtime.decibel)
+    insert = Realtime_log(timemap=realtime.timemap, label=realtime.label, decibel=realtime.decibel,
+                          logged_at=parse_timemap(realtime.timemap))
     session.add(insert)
-    session.commit()
-    session.refresh(insert)
     
-    access_token = get_access_token()
+    # 위험 소음이면 같은 트랜잭션에서 알림을 outbox 에 넣고 바로 응답
+    # (같은 라벨이 ALERT_WINDOW_SECONDS 안에 반복되면 합쳐서 한 번만 보낸다)
+    # 저장에 실패하면 보낸 것으로 기록한 알림을 되돌려서 그 라벨이 억제되지 않도록 한다
+    alert_body, alert_token = alert_coalescer.reserve(realtime.label)
+    if alert_body:
+        outbox.enqueue(session, ALERT_TITLE, alert_body)
     
-    url = FCM_API_URL
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json',
-    }
-
-    failed_tokens = []
-    
-    tokens = session.query(Push_alert.token).filter(Push_alert.permission == 'yes').all()
-    
-    if not tokens:
-        raise HTTPException(status_code=404, detail="No tokens found in the database")
-
-    tokens = [token[0] for token in tokens]
-    
-    if(realtime.label == "Bark" or realtime.label == "Car horn" or realtime.label == "Siren"):
-        if (realtime.label == "Siren"):
-            realtime.label = "사이렌 소리"
-        elif(realtime.label == "Car horn"):
-            realtime.label = "경적 소리"
-        elif(realtime.label == "Bark"):
-            realtime.label = "개 짖는 소리"
-            
-        for token in tokens:
-            message = {
-                "message": {
-                    "token": token,
-                    "notification": {
-                        "title": "위험 소음 감지",
-                        "body": f'{realtime.label}가 감지되었습니다!'
-                    }
-                }
-            }
-
-            response = requests.post(url, headers=headers, json=message)
-            
-            try:
-                response_data = response.json()
-                print("response_data:", response_data)
-            except ValueError as e:
-                raise HTTPException(status_code=response.status_code, detail=f"Invalid JSON response: {response.text}")
-            
-            if response.status_code != 200:
-                failed_tokens.append(token)
-    
-        if failed_tokens:
-            raise HTTPException(status_code=400, detail=f"Failed to send notification to tokens: {failed_tokens}")
+    try:
+        # 시간/일 집계도 같은 트랜잭션에서 갱신
+        await apply_rollup(session, [(insert.logged_at, insert.label, insert.decibel)])
+        await session.commit()
+    except Exception:
+        alert_coalescer.release(alert_token)
+        raise
+    outbox.notify()
     
     return insert
 
+REALTIME_BATCH_MAX = int(os.getenv("REALTIME_BATCH_MAX", 1000))
+
+# 여러 감지 이벤트를 한 번의 multi-row INSERT 로 저장
+# 이미 있는 timemap 은 건너뛰므로 같은 배치를 다시 보내도 안전하다.
+# 집계와 알림은 이 요청이 실제로 넣은 행만으로 계산한다 (재전송이 원래 요청과 겹쳐도 두 번 세지 않도록).
+@app.post("/realtimeInsertBatch")
+async def save_realtime_batch(records: List[RealtimeInsert], session: SessionDep):
+    if len(records) > REALTIME_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Too many records (max {REALTIME_BATCH_MAX})")
+
+    unique = {}
+    for record in records:
+        unique.setdefault(record.timemap, record)
+    if not unique:
+        return {"received": 0, "inserted": 0, "duplicates": 0}
+
+    alert_tokens = []
+    try:
+        existing = set((await session.execute(select(Realtime_log.timemap)
+                        .where(Realtime_log.timemap.in_(list(unique))))).scalars())
+        rows = [
+            {"timemap": r.timemap, "label": r.label, "decibel": r.decibel,
+             "logged_at": parse_timemap(r.timemap)}
+            for timemap, r in unique.items() if timemap not in existing
+        ]
+
+        inserted = []
+        if rows:
+            stmt = mysql_insert(Realtime_log.__table__).prefix_with('IGNORE')
+            # 확인 뒤에 같은 timemap 이 먼저 들어왔으면 (동시에 온 재전송) 한 번에 넣은 결과로는
+            # 어느 행이 빠졌는지 알 수 없으므로, 되돌리고 한 행씩 넣어서 실제로 들어간 행만 고른다
+            savepoint = await session.begin_nested()
+            result = await session.execute(stmt.values(rows))
+            if result.rowcount == len(rows):
+                await savepoint.commit()
+                inserted = rows
+            else:
+                await savepoint.rollback()
+                for row in rows:
+                    if (await session.execute(stmt.values(row))).rowcount:
+                        inserted.append(row)
+
+        if inserted:
+            await apply_rollup(session, [(row["logged_at"], row["label"], row["decibel"]) for row in inserted])
+
+        # 알림 평가는 배치당 한 번 (라벨별 감지 횟수와 측정 시각 범위로), outbox 는 같은 트랜잭션에
+        by_label = {}
+        for row in inserted:
+            by_label.setdefault(row["label"], []).append(row["logged_at"])
+        for label, times in by_label.items():
+            known = [t for t in times if t is not None]
+            span = (max(known) - min(known)).total_seconds() if known else None
+            alert_body, alert_token = alert_coalescer.reserve(label, count=len(times), span=span)
+            alert_tokens.append(alert_token)
+            if alert_body:
+                outbox.enqueue(session, ALERT_TITLE, alert_body)
+
+        await session.commit()
+        outbox.notify()
+    except Exception as e:
+        # 저장하지 못한 감지는 알림 병합 상태에서도 되돌린다
+        for alert_token in alert_tokens:
+            alert_coalescer.release(alert_token)
+        await session.rollback()
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+    return {"received": len(records), "inserted": len(inserted), "duplicates": len(records) - len(inserted)}
+
 @app.get("/getNoiseDataAll")
-async def get_noise_data():
-    query = session.query(Realtime_log).all()
-    return query
+async def get_noise_data(session: SessionDep,
+                         limit: Optional[int] = Query(None, ge=1, le=10000),
+                         after: Optional[str] = None,
+                         format: str = "json"):
+    if limit is not None:
+        return await keyset_page(session, select(Realtime_log), Realtime_log.timemap, after, limit)
+    return stream_rows(db.sessionmaker,
+                       select(Realtime_log).order_by(Realtime_log.timemap),
+                       format=format)
+
+# from/to 가 없으면 (Kakaomap 의 기본 'all') 테이블 전체가 되므로 /getNoiseDataAll 처럼 스트리밍한다
+@app.get("/getNoiseData")
+async def get_noise_data_range(session: SessionDep,
+                               start: Optional[datetime] = Query(None, alias="from"),
+                               end: Optional[datetime] = Query(None, alias="to"),
+                               label: Optional[str] = None,
+                               limit: Optional[int] = Query(None, ge=1, le=10000),
+                               after: Optional[str] = None,
+                               format: str = "json"):
+    query = noise_query(start, end, label)
+    if limit is not None:
+        try:
+            return await keyset_page(session, query, Realtime_log.timemap, after, limit)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+    return stream_rows(db.sessionmaker, query.order_by(Realtime_log.timemap), format=format)
+
+@app.get("/noiseRollup")
+async def get_noise_rollup(session: SessionDep,
+                           granularity: str = "hour",
+                           start: Optional[datetime] = Query(None, alias="from"),
+                           end: Optional[datetime] = Query(None, alias="to"),
+                           label: Optional[str] = None):
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {GRANULARITIES}")
+    try:
+        return await query_rollups(session, granularity, start, end, label)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@app.get("/noiseRollupWeek")
+async def get_noise_rollup_week(session: SessionDep, granularity: str = "hour"):
+    enddate = datetime.now()
+    return await get_noise_rollup(session, granularity, enddate - timedelta(days=7), enddate, None)
 
 @app.get("/getNoiseDataWeek")
-async def get_noise_data_week():
+async def get_noise_data_week(session: SessionDep):
     try:
         enddate = datetime.now()
         startdate = enddate - timedelta(days=7)
 
-        query = session.query(Realtime_log).filter(
-            func.substr(Realtime_log.timemap, 22, 19).between(
-                startdate.strftime("%Y-%m-%d-%H:%M:%S"),
-                enddate.strftime("%Y-%m-%d-%H:%M:%S")
-            )
-        ).all()
+        query = (await session.execute(noise_query(startdate, enddate))).scalars().all()
 
         return query
 
@@ -286,17 +384,12 @@ async def get_noise_data_week():
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @app.get("/getNoiseDataOneDay")
-async def get_noise_data_one_day():
+async def get_noise_data_one_day(session: SessionDep):
     try:
         enddate = datetime.now()
         startdate = enddate - timedelta(days=1)
 
-        query = session.query(Realtime_log).filter(
-            func.substr(Realtime_log.timemap, 22, 19).between(
-                startdate.strftime("%Y-%m-%d-%H:%M:%S"),
-                enddate.strftime("%Y-%m-%d-%H:%M:%S")
-            )
-        ).all()
+        query = (await session.execute(noise_query(startdate, enddate))).scalars().all()
 
         return query
 
@@ -304,13 +397,13 @@ async def get_noise_data_one_day():
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
 
 @app.delete("/userDelete")
-async def delete_user_data(id: str, role: str):
+async def delete_user_data(id: str, role: str, session: SessionDep):
     decoded_id = unquote_plus(id)
     decoded_role = unquote_plus(role)
-    delete = session.query(User_info).filter((User_info.email == decoded_id) & (User_info.role == decoded_role)).first()
-    session.delete(delete)
-    session.commit()
-    result = session.query(User_info).all()
+    delete = (await session.execute(select(User_info).where((User_info.email == decoded_id) & (User_info.role == decoded_role)))).scalars().first()
+    await session.delete(delete)
+    await session.commit()
+    result = (await session.execute(select(User_info))).scalars().all()
     return result
 
 class UserUpdate(BaseModel):
@@ -320,26 +413,24 @@ class UserUpdate(BaseModel):
     role: str
 
 @app.put("/userUpdate")
-async def update_user_data(user_data: UserUpdate):
+async def update_user_data(user_data: UserUpdate, session: SessionDep):
     try:
         decoded_id = unquote_plus(user_data.id)
         decoded_role = unquote_plus(user_data.role)
-        update = session.query(User_info).filter((User_info.email == decoded_id)&(User_info.role == decoded_role)).first()
+        update = (await session.execute(select(User_info).where((User_info.email == decoded_id)&(User_info.role == decoded_role)))).scalars().first()
         if not update:
             raise HTTPException(status_code=404, detail="User not found")
 
         update.name = user_data.name
         update.user_avatar = user_data.img
 
-        session.commit()
-        session.refresh(update)
+        await session.commit()
+        await session.refresh(update)
         return {"message": "User updated successfully", "user": update}
 
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        session.close()
 
 ######################################################################
 
@@ -347,229 +438,301 @@ async def update_user_data(user_data: UserUpdate):
 from fastapi import FastAPI, WebSocket
 from pydantic import BaseModel
 from starlette.websockets import WebSocketDisconnect
-import vito_stt_client_pb2 as pb
-import vito_stt_client_pb2_grpc as pb_grpc
-import grpc
-from typing import AsyncIterator  
-import wave   
-import struct
-import io
-import joblib
-from sentence_transformers import SentenceTransformer
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+import asyncio
+import time
+from model_registry import registry
+from embedding import EmbeddingService
+from inference import EmotionClassifier, EMOTIONS
+from features import get_features
+from stream_session import SessionManager, SessionLimitExceeded
+from executor import executors, ExecutorBusy
+from stt_client import SttClient
 
 API_BASE = "https://openapi.vito.ai"
 
 SAMPLE_RATE = 16000
-ENCODING = pb.DecoderConfig.AudioEncoding.LINEAR16
 BYTES_PER_SAMPLE = 2
-
-resp = requests.post(
-    'https://openapi.vito.ai/v1/authenticate',
-    data={'client_id': f'{YOUR_CLIENT_ID}',
-          'client_secret': f'{YOUR_CLIENT_SECRET}'}
+# 세션당 보관하는 오디오 길이 (기본 30초 -> 약 1.9MB, audio_buffer.py 참고)
+AUDIO_BUFFER_MS = int(os.getenv("AUDIO_BUFFER_MS", 30000))
+
+# VITO 인증은 import 시점이 아니라 처음 필요할 때 요청한다 (expire_at 까지 재사용)
+def fetch_vito_token():
+    resp = requests.post(
+        f'{API_BASE}/v1/authenticate',
+        data={'client_id': f'{YOUR_CLIENT_ID}',
+              'client_secret': f'{YOUR_CLIENT_SECRET}'},
+        timeout=10,
+    )
+    resp.raise_for_status()
+    body = resp.json()
+    return str(body.get('access_token')), body.get('expire_at', time.time() + 3600)
+
+vito_token = TokenCache(fetch_vito_token,
+                        refresh_margin=int(os.getenv("VITO_TOKEN_REFRESH_MARGIN", 600)),
+                        name='vito')
+
+# 워커당 gRPC 채널 하나를 모든 /ws 세션이 공유한다 (grpc 는 처음 쓸 때 import)
+stt_client = SttClient(
+    os.getenv("VITO_GRPC_TARGET", "grpc-openapi.vito.ai:443"),
+    vito_token,
+    sample_rate=SAMPLE_RATE,
+    keepalive_ms=int(os.getenv("STT_KEEPALIVE_MS", 30000)),
+    keepalive_timeout_ms=int(os.getenv("STT_KEEPALIVE_TIMEOUT_MS", 10000)),
+    max_retries=int(os.getenv("STT_MAX_RETRIES", 2)),
 )
-resp.raise_for_status()
-            
-TOKEN = str(resp.json().get('access_token'))
-
-
-# 오디오 데이터 증강 함수 정의
-def noise(data):
-    noise_amp = 0.035 * np.random.uniform() * np.amax(data)
-    data = data + noise_amp * np.random.normal(size=data.shape[0])
-    return data
-
-def stretch(data, rate):
-    return librosa.effects.time_stretch(y=data, rate=rate)
-
-def pitch(data, sampling_rate, pitch_factor):
-    return librosa.effects.pitch_shift(data, sr=sampling_rate, n_steps=pitch_factor)
-
-# 오디오 특성 추출 함수 정의
-def extract_features(data, sample_rate):
-    result = np.array([])
-    zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
-    result = np.hstack((result, zcr))
-    stft = np.abs(librosa.stft(data))
-    chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
-    result = np.hstack((result, chroma_stft))
-    mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
-    result = np.hstack((result, mfcc))
-    rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
-    result = np.hstack((result, rms))
-    mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
-    result = np.hstack((result, mel))
-    return result
 
-# 오디오 파일로부터 특성 추출 함수 정의
-def get_features(path):
-    data, sample_rate = librosa.load(path, duration=2.5, offset=0.0)
-    res1 = extract_features(data, sample_rate)
-    result = np.array(res1)
-    noise_data = noise(data)
-    res2 = extract_features(noise_data, sample_rate)
-    result = np.concatenate((result, res2), axis=0)
-    new_data = stretch(data, 0.7)
-    data_stretch_pitch = pitch(new_data, sample_rate, 0.8)
-    res3 = extract_features(data_stretch_pitch, sample_rate)
-    result = np.concatenate((result, res3), axis=0)
-    return result
-    
-# 문장 임베딩 클래스 정의
-class TextEmbedding:
-    def __init__(self, model_name):
-        self.model_name = model_name
-
-    def fit(self, X, y=None):
-        return self
-
-    def transform(self, X):
-        if 'sentence' in X.columns:
-            embedding_model = SentenceTransformer(self.model_name)
-            embedding_vec = embedding_model.encode(X['sentence'])
-            X_val = np.concatenate((X.drop(['sentence'], axis=1), embedding_vec), axis=1)
-        else:
-            embedding_vec = self.embedding_model.encode(X)
-            X_val = embedding_vec
-        return X_val
-    
+@app.on_event("startup")
+async def start_stt_client():
+    stt_client.start()
+
+@app.on_event("shutdown")
+async def close_stt_client():
+    await stt_client.close()
+
+@app.get("/sttStats")
+async def get_stt_stats():
+    return stt_client.stats()
+
+
+# 모델 레지스트리 등록 (프로세스당 한 번만 로드)
+EMBEDDING_MODEL_NAME = 'jhgan/ko-sroberta-sts'
+SENTIMENT_MODEL_NAME = 'nlp04/korean_sentiment_analysis_dataset3_best'
 pre_trained_model_path = 'src/jhgan_newko-sroberta-sts.h5'
-pre_trained_model = load_model(pre_trained_model_path)
-scaler = joblib.load('src/scaler.pkl')
+scaler_path = 'src/scaler.pkl'
+
+# 무거운 ML 라이브러리는 로더 안에서 import 한다 (서버 시작을 막지 않도록)
+def load_sentiment_pipeline():
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
+    tokenizer = AutoTokenizer.from_pretrained(SENTIMENT_MODEL_NAME, token=HUGGINGFACE_TOKEN)
+    model = AutoModelForSequenceClassification.from_pretrained(SENTIMENT_MODEL_NAME, token=HUGGINGFACE_TOKEN)
+    return pipeline(
+        "text-classification",
+        model=model,
+        tokenizer=tokenizer,
+        device="cpu",
+        top_k=None
+    )
 
+def load_embedding_model():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def load_emotion_model():
+    from keras.models import load_model
+    return load_model(pre_trained_model_path)
+
+def load_scaler():
+    import joblib
+    return joblib.load(scaler_path)
+
+def warmup_emotion_model(model):
+    shape = [1 if dim is None else dim for dim in model.input_shape]
+    model.predict(np.zeros(shape), verbose=0)
+
+registry.register('sentiment', load_sentiment_pipeline,
+                  warmup=lambda clf: clf("안녕하세요"))
+registry.register('embedding', load_embedding_model,
+                  warmup=lambda model: model.encode(["안녕하세요"]))
+registry.register('emotion_model', load_emotion_model,
+                  warmup=warmup_emotion_model)
+registry.register('scaler', load_scaler,
+                  warmup=lambda sc: sc.transform(np.zeros((1, sc.n_features_in_))))
+
+embedding_service = EmbeddingService(
+    registry,
+    cache_size=int(os.getenv("EMBEDDING_CACHE_SIZE", 4096)),
+    max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH", 32)),
+    max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", 5)),
+    runner=executors.runner('model'),
+)
 
 
-audio_chunks = []
-last_offset = 0 
-async def audio_stream_generator(websocket: WebSocket) -> AsyncIterator[pb.DecoderRequest]:
-    global audio_chunks
-    
-    config = pb.DecoderConfig(sample_rate=SAMPLE_RATE, use_itn=True)
-    yield pb.DecoderRequest(streaming_config=config)
-    
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+# /readyz 가 준비 완료로 보기 위해 로드되어 있어야 하는 모델 (빈 값이면 DB 만 확인)
+READY_MODELS = [name for name in os.getenv("READY_MODELS", "sentiment,embedding,emotion_model,scaler").split(",") if name]
+
+# 모델 / STT 모듈은 서버가 요청을 받기 시작한 뒤 백그라운드에서 미리 올린다
+async def preload():
+    # 구독자 캐시도 시작을 막지 않도록 여기서 읽는다 (실패하면 첫 발송 때 tokens() 가 다시 읽는다)
     try:
-        async for chunk in websocket.iter_bytes():
-            audio_chunks.extend(chunk)
-            #print("pb", pb.DecoderRequest(audio_content=chunk))
-            yield pb.DecoderRequest(audio_content=chunk)
-    except WebSocketDisconnect:
-        pass
-    
+        await subscribers.ensure_loaded()
+    except Exception as e:
+        print(f"subscriber cache load failed: {e}")
+    if not MODEL_PRELOAD:
+        return
+    for name in registry.names():
+        try:
+            await asyncio.to_thread(registry.warmup, [name])
+        except Exception as e:
+            print(f"model preload failed: {name}: {e}")
+    # 첫 세션이 TCP + TLS + HTTP/2 연결과 인증을 기다리지 않도록 미리 연결
+    try:
+        await stt_client.connect()
+    except Exception as e:
+        print(f"stt preload failed: {e}")
 
-async def transcribe_streaming_grpc(websocket: WebSocket):
-    global audio_chunks
-    
-    base = "grpc-openapi.vito.ai:443"
-    async with grpc.aio.secure_channel(base, credentials=grpc.ssl_channel_credentials()) as channel:
-        stub = pb_grpc.OnlineDecoderStub(channel)
-        metadata = (('authorization', 'Bearer ' + TOKEN),)
-
-        # Create the request iterator
-        req_iter = audio_stream_generator(websocket)
-        # Call the gRPC method with the request iterator and metadata
-        async for resp in stub.Decode(req_iter, metadata=metadata):
-            for res in resp.results:
-                if res.is_final:
-                    text = res.alternatives[0].text
-                    print(text)
-                    if(text != ''):
-                        start_time = res.alternatives[0].words[0].start_at
-                        end_time = res.alternatives[0].words[-1].start_at + res.alternatives[0].words[-1].duration
-
-                        start_offset = int(start_time * (SAMPLE_RATE / 1000))
-                        end_offset = int(end_time * (SAMPLE_RATE / 1000))
-                        
-                        text_result = await text_emotion(text)
-                    
-                        if audio_chunks:
-                            audio_data = audio_chunks[start_offset:end_offset]
-                            byte_data = struct.pack('<' + 'h'*len(audio_data), *audio_data)
-
-                            # WAV 파일 생성
-                            wav_buffer = io.BytesIO()
-                            with wave.open(wav_buffer, 'wb') as wav_file:
-                                # 채널 수 설정 (모노)
-                                wav_file.setnchannels(1)
-                                # 샘플 폭 설정 (2바이트)
-                                wav_file.setsampwidth(2)
-                                # 프레임 레이트 설정 (예: 44100Hz)
-                                wav_file.setframerate(16000)
-                                # 데이터 쓰기
-                                wav_file.writeframes(byte_data)
-
-                            print("WAV 파일이 생성되었습니다: output.wav")
-                            wav_buffer.seek(0)
-                            
-                            if(text_result != '중립'):
-                                audio_features = get_features(wav_buffer)
-                                X_audio = [audio_features]
-                                audio_features_df = pd.DataFrame(X_audio)
-
-                                text_data = pd.DataFrame({'sentence': [text]})
-                                final_df = pd.concat([audio_features_df, text_data], axis=1)
-
-                                txt_embed = TextEmbedding(model_name='jhgan/ko-sroberta-sts')
-                                X = txt_embed.transform(final_df)
-
-                                X = scaler.transform(X)
-                                X = np.expand_dims(X, axis=2)
-
-                                predictions = pre_trained_model.predict(X)
-                                predicted_labels = np.argmax(predictions, axis=1)
-                                predicted_labels = predicted_labels[0]
-                                
-                                if(predicted_labels == 2):
-                                    predicted_labels = 1
-                                elif(predicted_labels == 4):
-                                    predicted_labels = 6
-
-                                predicted_emotions = ['angry', 'anxious', 'embarrassed', 'happy', 'hurt', 'neutrality', 'sad']
-                                predicted_emotion = predicted_emotions[predicted_labels]
-                                
-                                
-                                print(f"Predicted emotion: {predicted_emotion}")
-                            else:
-                                predicted_emotion = 'neutrality'
-                            audio_chunks = audio_chunks[end_offset:]
-                            
-                            message = json.dumps({
-                            'text': text,
-                            "emotion": predicted_emotion
-                            })
-                            await websocket.send_text(message)
-    
-                                                
+@app.on_event("startup")
+async def start_preload():
+    asyncio.get_running_loop().create_task(preload())
+
+# liveness: 프로세스가 요청을 처리할 수 있는지만 본다
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+# readiness: DB 연결 + READY_MODELS 로드 여부
+@app.get("/readyz")
+async def readyz():
+    checks = {}
+    try:
+        async with db.sessionmaker() as ready_session:
+            await asyncio.wait_for(ready_session.execute(select(1)), timeout=2)
+        checks["database"] = "ok"
+    except Exception as e:
+        checks["database"] = f"{type(e).__name__}: {e}"
+    for name in READY_MODELS:
+        checks[name] = "ok" if registry.is_loaded(name) else "loading"
+    ready = all(value == "ok" for value in checks.values())
+    return JSONResponse(status_code=200 if ready else 503,
+                        content={"status": "ready" if ready else "not ready", "checks": checks})
+
+@app.on_event("shutdown")
+async def shutdown_executors():
+    executors.shutdown()
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
+
+@app.get("/executorStats")
+async def get_executor_stats():
+    return executors.stats()
+
+@app.get("/models")
+async def get_model_stats():
+    return registry.stats()
+
+emotion_classifier = EmotionClassifier(
+    registry,
+    max_batch_size=int(os.getenv("EMOTION_MAX_BATCH", 16)),
+    max_wait_ms=float(os.getenv("EMOTION_MAX_WAIT_MS", 5)),
+    runner=executors.runner('model'),
+)
+
+@app.get("/inferenceStats")
+async def get_inference_stats():
+    return emotion_classifier.stats()
+
+@app.get("/embeddingStats")
+async def get_embedding_stats():
+    return embedding_service.stats()
+
+
+
+# 발화 구간 오디오 + 문장으로 감정 예측 (CPU 작업은 실행기에서 처리)
+async def predict_utterance_emotion(audio_data, text, text_vec=None):
+    audio_features = await executors.run('features', get_features, audio_data, SAMPLE_RATE)
+    X_audio = np.asarray([audio_features])
+
+    if text_vec is None:
+        text_vec = await embedding_service.aencode([text])
+    X = np.concatenate((X_audio, text_vec), axis=1)
+
+    predicted_labels = await emotion_classifier.predict_label(X)
+
+    if(predicted_labels == 2):
+        predicted_labels = 1
+    elif(predicted_labels == 4):
+        predicted_labels = 6
+
+    return EMOTIONS[predicted_labels]
+
+
+# 텍스트 단계: 감성 분류 + 문장 임베딩 (추측 실행 때는 중간 결과로 미리 돌린다)
+async def text_stages(text):
+    return await asyncio.gather(text_emotion(text), embedding_service.aencode([text]))
+
+# 발화 하나의 감정 분석 (텍스트가 중립이면 오디오 분석은 건너뛴다)
+# text_task 는 같은 문장으로 미리 실행한 text_stages 작업 (없거나 실패하면 지금 계산)
+async def analyze_utterance(text, audio_data, text_task=None):
+    text_result, text_vec = None, None
+    if text_task is not None:
+        await asyncio.wait([text_task])
+        if not text_task.cancelled() and text_task.exception() is None:
+            text_result, text_vec = text_task.result()
+    if text_result is None:
+        try:
+            text_result = await text_emotion(text)
+        except ExecutorBusy as e:
+            print(f"text emotion skipped: {e}")
+            text_result = '중립'
+    if text_result == '중립':
+        return 'neutrality'
+    try:
+        predicted_emotion = await predict_utterance_emotion(audio_data, text, text_vec)
+    except ExecutorBusy as e:
+        # 추론이 밀려 있으면 감정 분석은 건너뛰고 텍스트만 전달
+        print(f"emotion skipped: {e}")
+        return 'neutrality'
+    print(f"Predicted emotion: {predicted_emotion}")
+    return predicted_emotion
+
+stream_sessions = SessionManager(
+    stt_client,
+    analyze_utterance,
+    sample_rate=SAMPLE_RATE,
+    capacity_ms=AUDIO_BUFFER_MS,
+    max_buffer_bytes=int(os.getenv("STREAM_BUFFER_BUDGET_MB", 64)) << 20,
+    max_pending=int(os.getenv("STREAM_MAX_PENDING", 2)),
+    analysis_workers=int(os.getenv("STREAM_ANALYSIS_WORKERS", 2)),
+    audio_queue=int(os.getenv("STREAM_AUDIO_QUEUE", 50)),
+    # 추측 실행 (기본 꺼짐). STT_SPECULATIVE_STABILITY=0 이면 모든 중간 결과에서 시작
+    text_stage=text_stages if os.getenv("STT_SPECULATIVE", "false").lower() == "true" else None,
+    speculative_threshold=float(os.getenv("STT_SPECULATIVE_STABILITY", 0.8)),
+    # 침묵 구간 압축 (VAD_ENABLED=false 로 끄면 받은 오디오를 그대로 보낸다)
+    vad=dict(
+        energy_db=float(os.getenv("VAD_ENERGY_DB", -50)),
+        zcr_max=float(os.getenv("VAD_ZCR_MAX", 0.25)),
+        hangover_ms=int(os.getenv("VAD_HANGOVER_MS", 300)),
+        preroll_ms=int(os.getenv("VAD_PREROLL_MS", 200)),
+        max_silence_ms=int(os.getenv("VAD_MAX_SILENCE_MS", 600)),
+    ) if os.getenv("VAD_ENABLED", "true").lower() == "true" else None,
+)
+
+@app.get("/streamStats")
+async def get_stream_stats():
+    return stream_sessions.stats()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     
     await websocket.accept()
+    try:
+        session = stream_sessions.open(websocket)
+    except SessionLimitExceeded as e:
+        # 1013: Try Again Later
+        await websocket.close(code=1013, reason=str(e))
+        return
     
     try:
-        await transcribe_streaming_grpc(websocket)
+        await session.run()
     except WebSocketDisconnect:
         print("WebSocket disconnected")
+    finally:
+        stream_sessions.close(session)
  
 
 @app.post("/textemotion")
 async def text_emotion(text):
-    model_name = "nlp04/korean_sentiment_analysis_dataset3_best"
-    tokenizer = AutoTokenizer.from_pretrained(model_name, token=HUGGINGFACE_TOKEN)
-    model = AutoModelForSequenceClassification.from_pretrained(model_name, token=HUGGINGFACE_TOKEN)
-    
-    bertClassifier = pipeline(
-        "text-classification",
-        model=model,
-        tokenizer=tokenizer,
-        device="cpu", 
-        top_k=None
-    )
-    
-    result = bertClassifier(text)[0]
-    first_label = result[0]['label']
+    first_label = await executors.run('model', classify_sentiment, text)
     print(first_label)
     return first_label
+
+def classify_sentiment(text):
+    bertClassifier = registry.get('sentiment')
+    with registry.lock('sentiment'):
+        result = bertClassifier(text)[0]
+    return result[0]['label']
     
 
 
@@ -583,25 +746,14 @@ async def predict_emotion(file: UploadFile = File(...), text: str = Form(...)):
     print(file.filename)  # 파일 이름 출력
     print(text)
     
-    audio_features = get_features(file_content)
-    X_audio = [audio_features]
-    audio_features_df = pd.DataFrame(X_audio)
-
-    text_data = pd.DataFrame({'sentence': [text]})
-    final_df = pd.concat([audio_features_df, text_data], axis=1)
+    audio_features = await executors.run('features', get_features, file_content)
+    X_audio = np.asarray([audio_features])
 
-    txt_embed = TextEmbedding(model_name='jhgan/ko-sroberta-sts')
-    X = txt_embed.transform(final_df)
+    text_vec = await embedding_service.aencode([text])
+    X = np.concatenate((X_audio, text_vec), axis=1)
 
-    X = scaler.transform(X)
-    X = np.expand_dims(X, axis=2)
-
-    predictions = pre_trained_model.predict(X)
-    predicted_labels = np.argmax(predictions, axis=1)
-    predicted_labels = predicted_labels[0]
-
-    predicted_emotions = ['angry', 'anxious', 'embarrassed', 'happy', 'hurt', 'neutrality', 'sad']
-    predicted_emotion = predicted_emotions[predicted_labels]
+    predicted_labels = await emotion_classifier.predict_label(X)
+    predicted_emotion = EMOTIONS[predicted_labels]
 
     print(f"Predicted emotion: {predicted_emotion}")
     #return {"predicted_emotion": predicted_emotion}
@@ -614,13 +766,127 @@ async def predict_emotion(file: UploadFile = File(...), text: str = Form(...)):
 # 서비스 계정 JSON 파일 경로
 SERVICE_ACCOUNT_FILE = 'src/soundproject-26e1d-firebase-adminsdk-ntoea-046129bd6b.json'
 
-def get_access_token():
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE,
-        scopes=['https://www.googleapis.com/auth/cloud-platform']
-    )
-    credentials.refresh(GoogleAuthRequest())
-    return credentials.token
+fcm_credentials = None
+
+def fetch_fcm_access_token():
+    global fcm_credentials
+    # 서비스 계정 파일은 한 번만 읽는다
+    if fcm_credentials is None:
+        fcm_credentials = service_account.Credentials.from_service_account_file(
+            SERVICE_ACCOUNT_FILE,
+            scopes=['https://www.googleapis.com/auth/cloud-platform']
+        )
+    fcm_credentials.refresh(GoogleAuthRequest())
+    return fcm_credentials.token, fcm_credentials.expiry
+
+fcm_token = TokenCache(fetch_fcm_access_token,
+                       refresh_margin=int(os.getenv("FCM_TOKEN_REFRESH_MARGIN", 300)),
+                       name='fcm')
+
+async def get_access_token():
+    return await fcm_token.get()
+
+@app.get("/tokenStats")
+async def get_token_stats():
+    return fcm_token.stats()
+
+# FCM 에서 더 이상 유효하지 않다고 응답한 토큰 삭제
+async def prune_push_tokens(tokens):
+    async with db.sessionmaker() as prune_session:
+        await prune_session.execute(delete(Push_alert).where(Push_alert.token.in_(tokens)))
+        await prune_session.commit()
+    subscribers.discard(tokens)
+    print(f"pruned {len(tokens)} unregistered tokens")
+
+push_dispatcher = FcmDispatcher(
+    FCM_API_URL,
+    get_access_token,
+    concurrency=int(os.getenv("FCM_CONCURRENCY", 100)),
+    max_retries=int(os.getenv("FCM_MAX_RETRIES", 3)),
+    backoff=float(os.getenv("FCM_BACKOFF", 0.5)),
+    on_unregistered=prune_push_tokens,
+)
+
+@app.on_event("shutdown")
+async def close_push_dispatcher():
+    await push_dispatcher.aclose()
+
+# 구독자 캐시는 전용 세션으로 읽는다
+async def load_subscribers():
+    async with db.sessionmaker() as refresh_session:
+        return (await refresh_session.execute(select(Push_alert.uuid, Push_alert.token, Push_alert.permission))).all()
+
+subscribers = SubscriberCache(load_subscribers,
+                              refresh_interval=int(os.getenv("SUBSCRIBER_REFRESH_SECONDS", 300)))
+
+@app.on_event("startup")
+async def start_subscriber_cache():
+    # 처음 읽기는 preload() 에서 백그라운드로
+    subscribers.start()
+
+@app.on_event("shutdown")
+async def stop_subscriber_cache():
+    subscribers.stop()
+
+@app.get("/subscriberStats")
+async def get_subscriber_stats():
+    return subscribers.stats()
+
+async def deliver_notification(title, body, audience, tokens=None):
+    if tokens is None:
+        tokens = await subscribers.all_tokens() if audience == 'all' else await subscribers.tokens()
+    return await push_dispatcher.send(tokens, title, body)
+
+outbox = NotificationOutbox(
+    db.sessionmaker,
+    deliver_notification,
+    workers=int(os.getenv("OUTBOX_WORKERS", 2)),
+    batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", 20)),
+    poll_interval=float(os.getenv("OUTBOX_POLL_SECONDS", 5)),
+    max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5)),
+)
+
+@app.on_event("startup")
+async def start_outbox():
+    outbox.start()
+
+@app.on_event("shutdown")
+async def stop_outbox():
+    outbox.stop()
+
+alert_coalescer = AlertCoalescer(window=float(os.getenv("ALERT_WINDOW_SECONDS", 30)))
+
+# 억제된 감지가 남은 채로 창이 끝나면 합친 알림을 보낸다
+async def enqueue_alerts(messages):
+    async with db.sessionmaker() as alert_session:
+        for body in messages:
+            outbox.enqueue(alert_session, ALERT_TITLE, body)
+        await alert_session.commit()
+
+async def flush_alerts():
+    while True:
+        await asyncio.sleep(1)
+        messages = alert_coalescer.flush()
+        if messages:
+            try:
+                await enqueue_alerts(messages)
+                outbox.notify()
+            except Exception as e:
+                print(f"alert flush failed: {e}")
+
+@app.on_event("startup")
+async def start_alert_flush():
+    asyncio.get_running_loop().create_task(flush_alerts())
+
+@app.get("/alertState")
+async def get_alert_state():
+    return alert_coalescer.state()
+
+@app.get("/outboxStats")
+async def get_outbox_stats():
+    stats = outbox.stats()
+    stats["status"] = await outbox.status_counts()
+    return stats
 
 class Token(BaseModel):
     token: str
@@ -635,7 +901,7 @@ class TokenInsert(BaseModel):
     permission: str = "yes" 
 
 @app.post("/insertToken")
-async def insert_token(tokenInsert: TokenInsert):
+async def insert_token(tokenInsert: TokenInsert, session: SessionDep):
     device_tokens = tokenInsert.fcmToken
     if not device_tokens:
         raise HTTPException(status_code=400, detail="No tokens available")
@@ -644,28 +910,32 @@ async def insert_token(tokenInsert: TokenInsert):
     print(tokenInsert.uuid)
     
     # 사용자 UUID로 기존 데이터를 조회
-    existing_entry = session.query(Push_alert).filter(Push_alert.uuid == tokenInsert.uuid).first()
-    existing_token = session.query(Push_alert).filter(Push_alert.token == token).first()
+    existing_entry = (await session.execute(select(Push_alert).where(Push_alert.uuid == tokenInsert.uuid))).scalars().first()
+    existing_token = (await session.execute(select(Push_alert).where(Push_alert.token == token))).scalars().first()
 
     if not existing_token and not existing_entry:
         new_entry = Push_alert(uuid=tokenInsert.uuid, token=token, permission=tokenInsert.permission)
         session.add(new_entry)
-        session.commit()
+        await session.commit()
+        subscribers.upsert(new_entry.token, new_entry.uuid, new_entry.permission)
         return {"message": "New user created and token inserted successfully", "data": new_entry}
     elif not existing_entry and existing_token:
         existing_token.uuid = tokenInsert.uuid
-        session.commit()
+        await session.commit()
+        subscribers.upsert(existing_token.token, existing_token.uuid, existing_token.permission)
         return {"message": "User update uuid", "data": existing_token}
     elif existing_entry and existing_entry.token == token:
         return {"message": "User already exists with the same uuid and token", "data": existing_entry}
     elif existing_entry and existing_entry.token != token and existing_token:
         existing_token.uuid = tokenInsert.uuid
-        session.commit()
+        await session.commit()
+        subscribers.upsert(existing_token.token, existing_token.uuid, existing_token.permission)
         return {"message": "User update uuid", "data": existing_token}
     else:
         new_entry = Push_alert(uuid=tokenInsert.uuid, token=token, permission=tokenInsert.permission)
         session.add(new_entry)
-        session.commit()
+        await session.commit()
+        subscribers.upsert(new_entry.token, new_entry.uuid, new_entry.permission)
         return {"message": "New user created and token inserted successfully", "data": new_entry}
 
 
@@ -676,48 +946,15 @@ class PushNotification(BaseModel):
 
 @app.post("/sendPushNotification")
 async def send_push_notification(notification: PushNotification):
-    access_token = get_access_token()
-    
-    url = 'https://fcm.googleapis.com/v1/projects/soundproject-26e1d/messages:send'
-    headers = {
-        'Authorization': f'Bearer {access_token}',
-        'Content-Type': 'application/json',
-    }
-
-    failed_tokens = []
-    
-    tokens = session.query(Push_alert.token).all()
+    tokens = await subscribers.all_tokens()
     
     if not tokens:
         raise HTTPException(status_code=404, detail="No tokens found in the database")
-
-    tokens = [token[0] for token in tokens]
     
-    for token in tokens:
-        print(token)
-        message = {
-            "message": {
-                "token": token,
-                "notification": {
-                    "title": notification.title,
-                    "body": notification.body
-                }
-            }
-        }
-
-        response = requests.post(url, headers=headers, json=message)
-        
-        try:
-            response_data = response.json()
-            print("response_data:", response_data)
-        except ValueError as e:
-            raise HTTPException(status_code=response.status_code, detail=f"Invalid JSON response: {response.text}")
-        
-        if response.status_code != 200:
-            failed_tokens.append(token)
+    dispatch = await push_dispatcher.send(tokens, notification.title, notification.body)
     
-    if failed_tokens:
-        raise HTTPException(status_code=400, detail=f"Failed to send notification to tokens: {failed_tokens}")
+    if dispatch.failed:
+        raise HTTPException(status_code=400, detail=f"Failed to send notification to tokens: {list(dispatch.failed)}")
     
     return {"message": "Push notifications sent successfully"}
 
@@ -726,9 +963,9 @@ class UUIDRequest(BaseModel):
     uuid: str
 
 @app.post("/getPermission")
-async def get_permission(request: UUIDRequest):
+async def get_permission(request: UUIDRequest, session: SessionDep):
     uuid = request.uuid
-    alerts = session.query(Push_alert).filter(Push_alert.uuid == uuid).all()
+    alerts = (await session.execute(select(Push_alert).where(Push_alert.uuid == uuid))).scalars().all()
     if not alerts:
         raise HTTPException(status_code=404, detail="No permission data found for this UUID")
 
@@ -740,7 +977,7 @@ class UpdatePermissionRequest(BaseModel):
     permission: str
 
 @app.post("/updatePermission")
-async def update_permission(request: UpdatePermissionRequest):
+async def update_permission(request: UpdatePermissionRequest, session: SessionDep):
     uuid = request.uuid
     permission = request.permission
 
@@ -748,11 +985,14 @@ async def update_permission(request: UpdatePermissionRequest):
         raise HTTPException(status_code=400, detail="Invalid permission value")
 
     try:
-        rows_updated = session.query(Push_alert).filter(Push_alert.uuid == uuid).update({"permission": permission}, synchronize_session=False)
+        result = await session.execute(update(Push_alert).where(Push_alert.uuid == uuid)
+                                       .values(permission=permission).execution_options(synchronize_session=False))
+        rows_updated = result.rowcount
         if rows_updated == 0:
             raise HTTPException(status_code=404, detail="No matching data found for this UUID")
-        session.commit()
+        await session.commit()
+        subscribers.set_permission(uuid, permission)
         return {"status": "success", "updated_rows": rows_updated}
     except Exception as e:
-        session.rollback()
+        await session.rollback()
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
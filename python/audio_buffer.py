@@ -0,0 +1,81 @@
+import numpy as np
+
+
+# 세션별 16bit PCM 링 버퍼
+#
+# 스트림 시작부터의 절대 샘플 위치(= STT 단어 타임스탬프 ms * sample_rate / 1000)로 접근한다.
+# 저장 공간을 두 번 이어 붙인 미러 구조라서 어떤 구간이든 복사 없이 연속된 ndarray 뷰로 꺼낼 수 있고,
+# 사용이 끝난 오디오는 시작 위치만 옮겨서 O(1) 로 버린다.
+#
+# 메모리: capacity_ms 동안의 샘플 * 2 byte * 2(미러)
+#   기본값 30초 @ 16kHz -> 480,000 샘플 -> 약 1.9MB / 스트림 (고정, 더 늘어나지 않음)
+# 용량을 넘으면 가장 오래된 오디오부터 덮어쓴다. 반환된 뷰는 이후 append 로 덮어쓰일 수 있으므로
+# 용량 이상 오디오가 더 들어올 동안 보관해야 한다면 복사해서 사용한다.
+class PcmRingBuffer:
+    def __init__(self, sample_rate=16000, capacity_ms=30000):
+        self.sample_rate = sample_rate
+        self.capacity = sample_rate * capacity_ms // 1000
+        self._data = np.zeros(self.capacity * 2, dtype=np.int16)
+        self.start = 0      # 버퍼에 남아 있는 가장 오래된 샘플의 절대 위치
+        self.end = 0        # 마지막으로 쓴 샘플 다음의 절대 위치
+        self.dropped = 0    # 용량 초과로 버려진 샘플 수
+        self._carry = b''   # 청크가 홀수 바이트로 끊겼을 때 남은 1바이트
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __len__(self):
+        return self.end - self.start
+
+    def ms_to_samples(self, ms):
+        return int(ms * self.sample_rate // 1000)
+
+    def _write(self, samples, pos):
+        n = len(samples)
+        self._data[pos:pos + n] = samples
+        self._data[pos + self.capacity:pos + self.capacity + n] = samples
+
+    def append(self, chunk):
+        if self._carry:
+            chunk = self._carry + bytes(chunk)
+        usable = len(chunk) - len(chunk) % 2
+        self._carry = bytes(chunk[usable:])
+        samples = np.frombuffer(chunk, dtype='<i2', count=usable // 2)
+
+        n = len(samples)
+        if n > self.capacity:
+            self.end += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+
+        pos = self.end % self.capacity
+        first = min(n, self.capacity - pos)
+        self._write(samples[:first], pos)
+        if first < n:
+            self._write(samples[first:], 0)
+        self.end += n
+
+        if self.end - self.start > self.capacity:
+            new_start = self.end - self.capacity
+            self.dropped += new_start - self.start
+            self.start = new_start
+
+    # 절대 샘플 구간 [begin, end) 의 복사 없는 뷰 (버퍼에 남아 있는 범위로 잘림)
+    def view(self, begin, end):
+        begin = max(begin, self.start)
+        end = min(end, self.end)
+        if end <= begin:
+            return self._data[:0]
+        pos = begin % self.capacity
+        return self._data[pos:pos + (end - begin)]
+
+    def slice_ms(self, start_ms, end_ms):
+        return self.view(self.ms_to_samples(start_ms), self.ms_to_samples(end_ms))
+
+    # 해당 위치 이전 오디오를 버린다 (O(1))
+    def consume_until(self, position):
+        self.start = max(self.start, min(position, self.end))
+
+    def consume_until_ms(self, ms):
+        self.consume_until(self.ms_to_samples(ms))
@@ -0,0 +1,93 @@
+import asyncio
+import time
+from collections import Counter
+
+
+# 배치 크기 / 큐 대기 시간 지표
+class BatchMetrics:
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.run_total = 0.0
+
+    def record(self, waits, run_seconds):
+        self.batches += 1
+        self.items += len(waits)
+        self.batch_sizes[len(waits)] += 1
+        self.wait_total += sum(waits)
+        self.wait_max = max(self.wait_max, max(waits))
+        self.run_total += run_seconds
+
+    def snapshot(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else None,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "avg_queue_wait_ms": self.wait_total / self.items * 1000 if self.items else None,
+            "max_queue_wait_ms": self.wait_max * 1000,
+            "avg_batch_run_ms": self.run_total / self.batches * 1000 if self.batches else None,
+        }
+
+
+# 여러 코루틴의 요청을 짧은 시간 동안 모아서 한 번에 처리하는 배처
+# batch_fn 은 입력 리스트를 받아 같은 길이의 결과 리스트를 돌려주는 동기 함수
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=32, max_wait_ms=5, runner=None):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        # 배치 실행기 (기본값: 스레드에서 실행)
+        self.runner = runner or asyncio.to_thread
+        self.metrics = BatchMetrics()
+        self._queue = None
+        self._task = None
+
+    def _ensure_worker(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._worker())
+
+    async def submit(self, item):
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._collect()
+            # 이미 취소된 요청은 배치에서 제외
+            batch = [entry for entry in batch if not entry[1].done()]
+            if not batch:
+                continue
+            items = [item for item, _, _ in batch]
+            started = time.perf_counter()
+            waits = [started - queued_at for _, _, queued_at in batch]
+            try:
+                results = await self.runner(self.batch_fn, items)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.record(waits, time.perf_counter() - started)
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,280 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+
+# 특성 프로필 비교: 지연 시간 + 예측 일치율
+# 샘플 CSV 형식: path,text,label (label 은 inference.EMOTIONS 중 하나)
+def bench_features(args):
+    import joblib
+    from keras.models import load_model
+    from sentence_transformers import SentenceTransformer
+
+    from features import get_features, PROFILES
+    from inference import EMOTIONS
+
+    with open(args.samples, newline='', encoding='utf-8') as f:
+        samples = list(csv.DictReader(f))
+
+    model = load_model(args.model)
+    scaler = joblib.load(args.scaler)
+    embedder = SentenceTransformer(args.embedding)
+    text_vecs = embedder.encode([row['text'] for row in samples])
+
+    predictions = {}
+    for profile in PROFILES:
+        latencies = []
+        rows = []
+        for sample in samples:
+            started = time.perf_counter()
+            rows.append(get_features(sample['path'], profile=profile))
+            latencies.append(time.perf_counter() - started)
+        X = scaler.transform(np.concatenate((np.vstack(rows), text_vecs), axis=1))
+        predictions[profile] = np.argmax(model.predict(np.expand_dims(X, axis=2), verbose=0), axis=1)
+
+        latencies = np.array(latencies) * 1000
+        labels = np.array([EMOTIONS.index(row['label']) for row in samples])
+        accuracy = float(np.mean(predictions[profile] == labels))
+        print(f"{profile:>9}: p50 {np.percentile(latencies, 50):.1f} ms, "
+              f"p95 {np.percentile(latencies, 95):.1f} ms, accuracy {accuracy:.3f}")
+
+    agreement = float(np.mean(predictions['training'] == predictions['inference']))
+    print(f"prediction agreement (training vs inference): {agreement:.3f}")
+
+
+# realtime_log 조회 비교: SUBSTR(timemap) 문자열 비교 vs logged_at 인덱스 범위 스캔
+# 운영 테이블을 건드리지 않도록 같은 구조의 realtime_log_bench 테이블에 합성 데이터를 만든다.
+def bench_realtime_log(args):
+    import random
+    from datetime import datetime, timedelta
+    from sqlalchemy import MetaData, create_engine, func, select, text
+
+    from database import DB_URL
+    from models import Realtime_log
+
+    engine = create_engine(DB_URL)
+    table = Realtime_log.__table__.to_metadata(MetaData(), name='realtime_log_bench')
+    table.drop(engine, checkfirst=True)
+    table.create(engine)
+
+    labels = ['Siren', 'Car horn', 'Bark', 'Street music', 'Drilling', 'Children playing']
+    now = datetime.now()
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        for offset in range(0, args.rows, 10000):
+            rows = []
+            for i in range(offset, min(offset + 10000, args.rows)):
+                logged_at = now - timedelta(seconds=rng.randrange(args.days * 86400))
+                # 기존 SUBSTR(timemap, 22, 19) 조회와 맞도록 위도+경도 21자 + 측정 시각
+                timemap = f"37.{rng.randrange(10**7):07d}127.{rng.randrange(10**7):07d}" \
+                          f"{logged_at:%Y-%m-%d-%H:%M:%S}"
+                rows.append({"timemap": timemap, "label": rng.choice(labels),
+                             "decibel": rng.randrange(30, 110), "logged_at": logged_at})
+            conn.execute(table.insert().prefix_with('IGNORE'), rows)
+    print(f"inserted {args.rows} rows")
+
+    start, end = now - timedelta(days=1), now
+    queries = {
+        'substr': select(table).where(func.substr(table.c.timemap, 22, 19).between(
+            start.strftime("%Y-%m-%d-%H:%M:%S"), end.strftime("%Y-%m-%d-%H:%M:%S"))),
+        'indexed': select(table).where(table.c.logged_at.between(start, end)),
+        'indexed+label': select(table).where(table.c.label == 'Siren',
+                                             table.c.logged_at.between(start, end)),
+    }
+    with engine.connect() as conn:
+        for name, query in queries.items():
+            compiled = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+            plan = conn.execute(text("EXPLAIN " + compiled)).mappings().first()
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                count = len(conn.execute(query).all())
+                timings.append(time.perf_counter() - started)
+            print(f"{name:>14}: {count} rows, median {np.median(timings) * 1000:.1f} ms, "
+                  f"type={plan['type']} key={plan['key']} rows_examined={plan['rows']}")
+
+    if not args.keep:
+        table.drop(engine)
+
+
+# 감지 이벤트 저장 처리량: /realtimeInsert 건별 요청 vs /realtimeInsertBatch
+# 실행 중인 서버에 "Bench" 라벨 이벤트를 저장한다 (위험 소음 라벨이 아니므로 알림은 나가지 않음)
+def bench_ingest(args):
+    import asyncio
+    import uuid
+    from datetime import datetime
+
+    import httpx
+
+    run = uuid.uuid4().hex[:8]
+
+    def events(prefix, n):
+        now = datetime.now()
+        return [{"timemap": f"{prefix}{run}{i:07d}{now:%Y-%m-%d-%H:%M:%S}", "label": "Bench",
+                 "decibel": 50 + i % 40} for i in range(n)]
+
+    async def per_row(client, items):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def post(item):
+            async with semaphore:
+                (await client.post("/realtimeInsert", json=item)).raise_for_status()
+        await asyncio.gather(*(post(item) for item in items))
+
+    async def batched(client, items):
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def post(chunk):
+            async with semaphore:
+                (await client.post("/realtimeInsertBatch", json=chunk)).raise_for_status()
+        await asyncio.gather(*(post(items[i:i + args.batch]) for i in range(0, len(items), args.batch)))
+
+    async def main():
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            for name, fn, prefix in [('per-row', per_row, 'R'), ('batch', batched, 'B')]:
+                items = events(prefix, args.events)
+                started = time.perf_counter()
+                await fn(client, items)
+                elapsed = time.perf_counter() - started
+                print(f"{name:>8}: {args.events} events in {elapsed:.2f}s "
+                      f"({args.events / elapsed:.0f} events/s)")
+
+    asyncio.run(main())
+
+
+# 동시 요청 처리량: 같은 GET 엔드포인트에 concurrency 개의 요청을 계속 보낸다
+# 동기 세션(변경 전) 과 비동기 엔진(변경 후) 서버에 각각 실행해 비교한다.
+def bench_load(args):
+    import asyncio
+
+    import httpx
+
+    async def main():
+        latencies = []
+        errors = 0
+        remaining = iter(range(args.requests))
+
+        async def worker(client):
+            nonlocal errors
+            for _ in remaining:
+                started = time.perf_counter()
+                try:
+                    (await client.get(args.path)).raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+
+        latencies = np.array(latencies) * 1000
+        print(f"{args.path} x{args.requests} @ {args.concurrency}: {args.requests / elapsed:.0f} req/s, "
+              f"p50 {np.percentile(latencies, 50):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms, "
+              f"p99 {np.percentile(latencies, 99):.1f} ms, errors {errors}")
+
+    asyncio.run(main())
+
+
+# 서버 시작 시간: import 프로파일 (python -X importtime) + /healthz, /readyz 응답까지 걸린 시간
+def bench_startup(args):
+    import os
+    import subprocess
+    import sys
+
+    import httpx
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          cwd=here, capture_output=True, text=True)
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        print(proc.stderr.splitlines()[-1] if proc.stderr else "import failed")
+
+    # "import time: self [us] | cumulative | imported package"
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # 패키지 이름 앞의 공백 2칸이 중첩 깊이 1 (첫 칸은 구분자 뒤 공백)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((int(cumulative_us), int(self_us), depth, name.strip()))
+
+    print(f"import app: {elapsed:.2f}s wall, {sum(m[1] for m in modules) / 1e6:.2f}s in module bodies")
+    # app 이 직접 import 한 모듈 (깊이 1) 중 오래 걸린 순
+    print(f"top {args.top} imports of app by cumulative time:")
+    for cumulative_us, _, _, name in sorted((m for m in modules if m[2] == 1), reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {name}")
+
+    if not args.serve:
+        return
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'app:app', '--port', str(args.port)], cwd=here)
+    started = time.perf_counter()
+    try:
+        pending = {'/healthz': None, '/readyz': None}
+        while time.perf_counter() - started < args.timeout and None in pending.values():
+            for path in [p for p, t in pending.items() if t is None]:
+                try:
+                    if httpx.get(f"http://127.0.0.1:{args.port}{path}", timeout=1).status_code == 200:
+                        pending[path] = time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+            time.sleep(0.05)
+        for path, seconds in pending.items():
+            print(f"{path}: " + (f"{seconds:.2f}s" if seconds is not None else f"not ready after {args.timeout}s"))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="soribwa benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('features', help="compare feature profiles")
+    p.add_argument('samples', help="CSV with path,text,label columns")
+    p.add_argument('--model', default='src/jhgan_newko-sroberta-sts.h5')
+    p.add_argument('--scaler', default='src/scaler.pkl')
+    p.add_argument('--embedding', default='jhgan/ko-sroberta-sts')
+    p.set_defaults(func=bench_features)
+
+    p = sub.add_parser('realtime-log', help="compare realtime_log range queries")
+    p.add_argument('--rows', type=int, default=2_000_000)
+    p.add_argument('--days', type=int, default=365)
+    p.add_argument('--repeat', type=int, default=5)
+    p.add_argument('--keep', action='store_true', help="keep realtime_log_bench afterwards")
+    p.set_defaults(func=bench_realtime_log)
+
+    p = sub.add_parser('ingest', help="compare per-row and batch realtime ingest")
+    p.add_argument('--url', default='http://localhost:5000')
+    p.add_argument('--events', type=int, default=2000)
+    p.add_argument('--batch', type=int, default=200)
+    p.add_argument('--concurrency', type=int, default=8)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser('load', help="concurrent request throughput against a running server")
+    p.add_argument('--url', default='http://localhost:5000')
+    p.add_argument('--path', default='/getNoiseDataOneDay')
+    p.add_argument('--requests', type=int, default=2000)
+    p.add_argument('--concurrency', type=int, default=50)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser('startup', help="import-time profile and time to /healthz, /readyz")
+    p.add_argument('--top', type=int, default=15)
+    p.add_argument('--serve', action='store_true', help="also start uvicorn and time /healthz and /readyz")
+    p.add_argument('--port', type=int, default=5099)
+    p.add_argument('--timeout', type=float, default=300)
+    p.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 from sqlalchemy import *
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 import os.path
 from dotenv import load_dotenv
 
@@ -19,10 +20,19 @@ DBNAME = os.getenv("Mysql_DBname")
 
 # DB URL 생성
 DB_URL = f'mysql+pymysql://{USERNAME}:{PASSWORD}@{HOSTNAME}:{PORT}/{DBNAME}'
+ASYNC_DB_URL = f'mysql+aiomysql://{USERNAME}:{PASSWORD}@{HOSTNAME}:{PORT}/{DBNAME}'
 
+# 커넥션 풀 설정
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 500))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# 동기 엔진 (관리용 스크립트, 벤치마크)
 class db_conn:
     def __init__(self):
-        self.engine = create_engine(DB_URL, pool_recycle=500)
+        self.engine = create_engine(DB_URL, pool_recycle=POOL_RECYCLE, pool_pre_ping=POOL_PRE_PING)
 
     def sessionmaker(self):
         Session = sessionmaker(bind=self.engine)
@@ -31,4 +41,37 @@ class db_conn:
     
     def connection(self):
         conn = self.engine.connection()
-        return conn
\ No newline at end of file
+        return conn
+
+
+# 비동기 엔진 (API 서버)
+# 요청마다 get_session 으로 세션을 새로 열고, 요청이 끝나면 닫는다.
+class async_db_conn:
+    def __init__(self):
+        self.engine = create_async_engine(
+            ASYNC_DB_URL,
+            pool_size=POOL_SIZE,
+            max_overflow=MAX_OVERFLOW,
+            pool_timeout=POOL_TIMEOUT,
+            pool_recycle=POOL_RECYCLE,
+            pool_pre_ping=POOL_PRE_PING,
+        )
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+
+    def sessionmaker(self):
+        return self.session_factory()
+
+    # FastAPI 의존성: 요청 단위 세션 (예외가 나면 롤백)
+    async def get_session(self):
+        async with self.session_factory() as session:
+            try:
+                yield session
+            except Exception:
+                await session.rollback()
+                raise
+
+    def pool_status(self):
+        return self.engine.pool.status()
+
+    async def dispose(self):
+        await self.engine.dispose()
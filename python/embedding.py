@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from batching import MicroBatcher
+
+
+# 캐시 키용 문장 정규화 (유니코드 NFC + 공백 정리)
+def normalize_text(text):
+    return ' '.join(unicodedata.normalize('NFC', str(text)).split())
+
+
+# 문장 -> 벡터 LRU 캐시
+class EmbeddingCache:
+    def __init__(self, max_size=4096):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return vec
+
+    def put(self, key, vec):
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# 문장 임베딩 서비스
+# 모델은 레지스트리에 상주하고, 캐시에 없는 문장만 모아서 한 번의 encode 로 처리한다.
+class EmbeddingService:
+    def __init__(self, registry, model_key='embedding', cache_size=4096,
+                 max_batch_size=32, max_wait_ms=5, runner=None):
+        self.registry = registry
+        self.model_key = model_key
+        self.cache = EmbeddingCache(cache_size)
+        # 인코딩 중인 문장 -> Future (동시에 같은 문장을 요청하면 한 번만 인코딩)
+        self._inflight = {}
+        self.coalesced = 0
+        self.batcher = MicroBatcher(self._encode_batch, max_batch_size=max_batch_size,
+                                    max_wait_ms=max_wait_ms, runner=runner)
+
+    def _encode_batch(self, keys):
+        model = self.registry.get(self.model_key)
+        with self.registry.lock(self.model_key):
+            vectors = model.encode(keys)
+        for key, vec in zip(keys, vectors):
+            vec.setflags(write=False)
+            self.cache.put(key, vec)
+        return list(vectors)
+
+    # 동기 호출용 (캐시에 없는 문장들을 한 배치로 인코딩)
+    def encode(self, sentences):
+        keys = [normalize_text(s) for s in sentences]
+        vectors = [self.cache.get(key) for key in keys]
+        missing = list(dict.fromkeys(key for key, vec in zip(keys, vectors) if vec is None))
+        if missing:
+            encoded = dict(zip(missing, self._encode_batch(missing)))
+            vectors = [encoded[key] if vec is None else vec for key, vec in zip(keys, vectors)]
+        return np.vstack(vectors)
+
+    def _submit(self, key):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return future
+        future = asyncio.ensure_future(self.batcher.submit(key))
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return future
+
+    # 비동기 호출용 (동시에 들어온 다른 요청의 문장과 함께 배치 인코딩)
+    # 다른 요청이 이미 인코딩 중인 문장은 그 결과를 같이 기다린다
+    async def aencode(self, sentences):
+        keys = [normalize_text(s) for s in sentences]
+        vectors = [self.cache.get(key) for key in keys]
+        pending = {}
+        for key, vec in zip(keys, vectors):
+            if vec is None and key not in pending:
+                pending[key] = self._submit(key)
+        if pending:
+            # 한 호출이 취소되어도 같은 문장을 기다리는 다른 호출에는 영향이 없도록 shield
+            await asyncio.gather(*(asyncio.shield(future) for future in pending.values()))
+            vectors = [pending[key].result() if vec is None else vec for key, vec in zip(keys, vectors)]
+        return np.vstack(vectors)
+
+    def stats(self):
+        total = self.cache.hits + self.cache.misses
+        return {
+            "cache_size": len(self.cache),
+            "cache_max_size": self.cache.max_size,
+            "hits": self.cache.hits,
+            "misses": self.cache.misses,
+            "hit_rate": self.cache.hits / total if total else None,
+            "coalesced": self.coalesced,
+            "batching": self.batcher.metrics.snapshot(),
+        }
@@ -0,0 +1,173 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+
+class ExecutorBusy(Exception):
+    def __init__(self, stage):
+        super().__init__(f"{stage} queue is full")
+        self.stage = stage
+
+
+# 작업 종류별 실행 단계
+# 동시 실행 수는 풀 크기로, 대기 중인 작업 수는 max_queue 로 제한한다.
+class Stage:
+    def __init__(self, name, pool_factory, workers, max_queue):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool_factory = pool_factory
+        self._pool = None
+        self._semaphore = None
+        self.waiting = 0
+        self.running = 0
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.pool_restarts = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = self._pool_factory(self.workers)
+        return self._pool
+
+    async def run(self, fn, *args, **kwargs):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusy(self.name)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.workers)
+
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started = time.perf_counter()
+        self.wait_total += started - queued_at
+        self.dispatched += 1
+        self.running += 1
+        loop = asyncio.get_running_loop()
+        job = functools.partial(fn, *args, **kwargs)
+        try:
+            pool = self.pool
+            try:
+                future = pool.submit(job)
+            except BrokenExecutor:
+                # 워커 프로세스가 죽으면 (OOM, 네이티브 라이브러리 오류) 풀 전체를 못 쓰게 되므로 새로 만든다
+                self._restart_pool(pool)
+                pool = self.pool
+                future = pool.submit(job)
+        except Exception:
+            self._finish(None, None, started)
+            raise
+        # 호출한 쪽이 취소되어도 풀 안의 작업은 계속 대기/실행되므로,
+        # 슬롯은 await 가 끝날 때가 아니라 풀의 작업이 끝났을 때 돌려준다
+        future.add_done_callback(lambda f: self._finish_threadsafe(loop, pool, f, started))
+        return await asyncio.wrap_future(future, loop=loop)
+
+    def _restart_pool(self, pool):
+        # 같은 풀에서 실패한 작업이 여러 개여도 한 번만 새로 만든다
+        if self._pool is not pool:
+            return
+        print(f"{self.name} pool is broken, restarting")
+        self.shutdown()
+        self.pool_restarts += 1
+
+    def _finish_threadsafe(self, loop, pool, future, started):
+        try:
+            loop.call_soon_threadsafe(self._finish, pool, future, started)
+        except RuntimeError:
+            # 종료 중 (루프가 이미 닫힘)
+            pass
+
+    def _finish(self, pool, future, started):
+        elapsed = time.perf_counter() - started
+        self.running -= 1
+        if future is None or (not future.cancelled() and future.exception() is not None):
+            self.failed += 1
+            # 실행 중에 워커가 죽은 작업: 다음 작업은 새 풀에서 실행한다
+            if future is not None and isinstance(future.exception(), BrokenExecutor):
+                self._restart_pool(pool)
+        elif future.cancelled():
+            self.cancelled += 1
+        else:
+            self.completed += 1
+            self.run_total += elapsed
+            self.run_max = max(self.run_max, elapsed)
+        self._semaphore.release()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "pool_restarts": self.pool_restarts,
+            "avg_wait_ms": self.wait_total / self.dispatched * 1000 if self.dispatched else None,
+            "avg_run_ms": self.run_total / self.completed * 1000 if self.completed else None,
+            "max_run_ms": self.run_max * 1000,
+        }
+
+
+def _process_pool(workers):
+    # TF/torch 가 로드된 부모 프로세스를 fork 하지 않도록 spawn 사용
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+def _thread_pool(prefix):
+    return lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=prefix)
+
+
+# CPU 작업을 이벤트 루프 밖에서 실행하는 실행기 모음
+#   features : librosa 특성 추출 (프로세스 풀, FEATURE_EXECUTOR=thread 로 변경 가능)
+#   model    : GIL 을 놓는 모델 추론 (스레드 풀)
+class Executors:
+    def __init__(self):
+        feature_pool = _process_pool
+        if os.getenv("FEATURE_EXECUTOR", "process") == "thread":
+            feature_pool = _thread_pool('features')
+        self.stages = {
+            'features': Stage('features', feature_pool,
+                              int(os.getenv("FEATURE_WORKERS", 2)),
+                              int(os.getenv("FEATURE_QUEUE_DEPTH", 32))),
+            'model': Stage('model', _thread_pool('model'),
+                           int(os.getenv("MODEL_THREADS", 4)),
+                           int(os.getenv("MODEL_QUEUE_DEPTH", 64))),
+        }
+
+    async def run(self, stage, fn, *args, **kwargs):
+        return await self.stages[stage].run(fn, *args, **kwargs)
+
+    # MicroBatcher 의 runner 로 사용
+    def runner(self, stage):
+        return functools.partial(self.run, stage)
+
+    def shutdown(self):
+        for stage in self.stages.values():
+            stage.shutdown()
+
+    def stats(self):
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+
+executors = Executors()
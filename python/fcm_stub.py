@@ -0,0 +1,53 @@
+import asyncio
+import itertools
+import os
+from collections import Counter
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+# 로컬 테스트용 FCM HTTP v1 스텁 서버
+#   uvicorn fcm_stub:app --port 8090
+#   FCM_API_URL=http://localhost:8090/v1/projects/stub/messages:send
+#
+# 토큰 접두어로 응답을 흉내낸다.
+#   unregistered-* : 404 UNREGISTERED (DB 에서 삭제되어야 함)
+#   throttle-*     : 처음 두 번은 429, 그 다음부터 200
+#   error-*        : 항상 500
+#   그 외          : 200
+STUB_LATENCY_MS = float(os.getenv("FCM_STUB_LATENCY_MS", 20))
+
+app = FastAPI()
+attempts = Counter()
+message_ids = itertools.count(1)
+
+
+def fcm_error(status_code, status, error_code=None):
+    error = {"code": status_code, "message": status, "status": status}
+    if error_code:
+        error["details"] = [{
+            "@type": "type.googleapis.com/google.firebase.fcm.v1.FcmError",
+            "errorCode": error_code,
+        }]
+    return JSONResponse(status_code=status_code, content={"error": error})
+
+
+@app.post("/v1/projects/{project}/messages:send")
+async def send(project: str, request: Request):
+    await asyncio.sleep(STUB_LATENCY_MS / 1000)
+    token = (await request.json())["message"]["token"]
+    attempts[token] += 1
+
+    if token.startswith("unregistered-"):
+        return fcm_error(404, "NOT_FOUND", "UNREGISTERED")
+    if token.startswith("throttle-") and attempts[token] <= 2:
+        return fcm_error(429, "RESOURCE_EXHAUSTED", "QUOTA_EXCEEDED")
+    if token.startswith("error-"):
+        return fcm_error(500, "INTERNAL", "INTERNAL")
+    return {"name": f"projects/{project}/messages/{next(message_ids)}"}
+
+
+@app.get("/stats")
+async def stats():
+    return {"tokens": len(attempts), "requests": sum(attempts.values())}
@@ -0,0 +1,229 @@
+import functools
+import io
+import os
+import time
+
+import librosa
+import numpy as np
+
+
+# librosa 기본값과 동일한 STFT 설정
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MELS = 128
+N_MFCC = 20
+TOP_DB = 80.0
+
+# 특성 추출 프로필
+#   training  : 학습 때와 같은 랜덤 노이즈 + time_stretch/pitch_shift (phase vocoder)
+#   inference : 고정 시드 노이즈 + phase vocoder 한 번으로 줄인 근사 (같은 벡터 레이아웃)
+# 라벨이 있는 데이터로 benchmark.py features 의 예측 일치율을 확인하기 전까지 기본값은 training
+PROFILES = ('training', 'inference')
+DEFAULT_PROFILE = os.getenv("FEATURE_PROFILE", "training")
+INFERENCE_SEED = int(os.getenv("FEATURE_SEED", 42))
+INFERENCE_RES_TYPE = os.getenv("FEATURE_RES_TYPE", "soxr_qq")
+
+# 특성 추출 샘플레이트 (모델이 학습된 librosa 기본값 22050Hz)
+# 16000 으로 두면 리샘플링 없이 /ws 오디오를 그대로 쓰지만, 같은 설정으로 학습한 모델이 필요하다.
+FEATURE_SAMPLE_RATE = int(os.getenv("FEATURE_SAMPLE_RATE", 22050))
+RESAMPLE_TYPE = os.getenv("FEATURE_RESAMPLE_TYPE", "soxr_hq")
+CLIP_SECONDS = 2.5
+
+STRETCH_RATE = 0.7
+PITCH_STEPS = 0.8
+
+
+# 오디오 데이터 증강 함수 정의
+def noise(data):
+    noise_amp = 0.035 * np.random.uniform() * np.amax(data)
+    data = data + noise_amp * np.random.normal(size=data.shape[0])
+    return data
+
+def stretch(data, rate):
+    return librosa.effects.time_stretch(y=data, rate=rate)
+
+def pitch(data, sampling_rate, pitch_factor):
+    return librosa.effects.pitch_shift(data, sr=sampling_rate, n_steps=pitch_factor)
+
+# 고정 시드 노이즈 (같은 입력이면 항상 같은 결과)
+def seeded_noise(data, seed=INFERENCE_SEED):
+    rng = np.random.default_rng(seed)
+    noise_amp = 0.035 * rng.uniform() * np.amax(data)
+    return data + noise_amp * rng.standard_normal(data.shape[0])
+
+# time_stretch + pitch_shift 근사
+# 학습 경로는 phase vocoder 를 두 번 거친다 (stretch, 그리고 pitch_shift 안의 stretch).
+# 두 비율을 곱해서 phase vocoder 한 번으로 늘이고 리샘플링으로 음높이를 맞춘다 (길이는 같다).
+# 위상이 어긋난 프레임을 overlap-add 할 때마다 레벨이 줄어들기 때문에, 빠진 한 번만큼
+# APPROX_GAIN 을 곱해서 rms / mel 에너지를 학습 경로에 맞춘다 (python features.py 로 측정).
+APPROX_GAIN = 0.76
+
+def approx_stretch_pitch(data, sampling_rate, rate=STRETCH_RATE, n_steps=PITCH_STEPS):
+    factor = 2.0 ** (n_steps / 12)
+    stretched = librosa.effects.time_stretch(y=data, rate=rate / factor)
+    shifted = librosa.resample(stretched, orig_sr=sampling_rate * factor, target_sr=sampling_rate,
+                               res_type=INFERENCE_RES_TYPE)
+    return APPROX_GAIN * shifted
+
+
+@functools.lru_cache(maxsize=8)
+def mel_basis(sample_rate):
+    return librosa.filters.mel(sr=sample_rate, n_fft=N_FFT, n_mels=N_MELS)
+
+
+# 클립별 power_to_db (top_db 클리핑을 클립 단위로 적용)
+def _power_to_db(S):
+    log_spec = 10.0 * np.log10(np.maximum(1e-10, S))
+    return np.maximum(log_spec, log_spec.max(axis=(-2, -1), keepdims=True) - TOP_DB)
+
+
+# 오디오 특성 추출 함수 정의
+# STFT 는 한 번만 계산하고 chroma / mel / MFCC 를 모두 같은 스펙트로그램에서 만든다.
+# zcr, rms 는 librosa 와 같은 값을 내기 위해 시간 영역 프레임에서 계산한다.
+# (스펙트럼 기반 rms 는 hann 윈도우가 적용되어 값이 달라진다)
+def extract_features(data, sample_rate):
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y=data), axis=-1)
+    stft = np.abs(librosa.stft(data, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate), axis=-1)
+    mel_spec = mel_basis(sample_rate) @ (stft ** 2)
+    mfcc = np.mean(librosa.feature.mfcc(S=_power_to_db(mel_spec), n_mfcc=N_MFCC), axis=-1)
+    rms = np.mean(librosa.feature.rms(y=data), axis=-1)
+    mel = np.mean(mel_spec, axis=-1)
+    return np.hstack((zcr, chroma_stft, mfcc, rms, mel))
+
+
+# 같은 길이의 여러 클립 (n_clips, n_samples) 을 한 번에 처리하는 배치 버전
+# 반환값: (n_clips, n_features)
+def extract_features_batch(clips, sample_rate):
+    clips = np.atleast_2d(clips)
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y=clips), axis=-1)
+    stft = np.abs(librosa.stft(clips, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    # chroma 는 튜닝 추정이 클립마다 달라야 하므로 클립 단위로 계산
+    chroma_stft = np.stack([
+        np.mean(librosa.feature.chroma_stft(S=S, sr=sample_rate), axis=-1) for S in stft
+    ])
+    mel_spec = np.einsum('mf,nft->nmt', mel_basis(sample_rate), stft ** 2, optimize=True)
+    mfcc = np.mean(librosa.feature.mfcc(S=_power_to_db(mel_spec), n_mfcc=N_MFCC), axis=-1)
+    rms = np.mean(librosa.feature.rms(y=clips), axis=-1)
+    mel = np.mean(mel_spec, axis=-1)
+    return np.hstack((zcr.reshape(len(clips), -1), chroma_stft, mfcc,
+                      rms.reshape(len(clips), -1), mel))
+
+
+# 기존 구현 (librosa 를 특성마다 따로 호출). 수치 비교용으로 남겨둔다.
+def extract_features_reference(data, sample_rate):
+    result = np.array([])
+    zcr = np.mean(librosa.feature.zero_crossing_rate(y=data).T, axis=0)
+    result = np.hstack((result, zcr))
+    stft = np.abs(librosa.stft(data))
+    chroma_stft = np.mean(librosa.feature.chroma_stft(S=stft, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, chroma_stft))
+    mfcc = np.mean(librosa.feature.mfcc(y=data, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, mfcc))
+    rms = np.mean(librosa.feature.rms(y=data).T, axis=0)
+    result = np.hstack((result, rms))
+    mel = np.mean(librosa.feature.melspectrogram(y=data, sr=sample_rate).T, axis=0)
+    result = np.hstack((result, mel))
+    return result
+
+
+# 파일 경로 / 파일 객체 / bytes 를 원래 샘플레이트 그대로 한 번만 디코딩
+def decode_audio(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return librosa.load(source, sr=None, duration=CLIP_SECONDS, offset=0.0)
+
+
+# int16 / float PCM 을 특성 추출용 float32 신호로 변환 (앞 2.5초, 필요할 때만 리샘플링)
+def prepare_audio(data, sample_rate, target_sr=None):
+    target_sr = target_sr or FEATURE_SAMPLE_RATE
+    data = np.asarray(data)
+    data = data[:int(sample_rate * CLIP_SECONDS)]
+    if data.dtype == np.int16:
+        data = data.astype(np.float32) / 32768.0
+    else:
+        data = data.astype(np.float32, copy=False)
+    if sample_rate != target_sr:
+        data = librosa.resample(data, orig_sr=sample_rate, target_sr=target_sr, res_type=RESAMPLE_TYPE)
+    return data, target_sr
+
+
+# 오디오로부터 특성 추출 함수 정의
+# source 는 PCM ndarray(sample_rate 필요) 또는 파일 경로 / 파일 객체 / bytes
+def get_features(source, sample_rate=None, profile=None):
+    profile = profile or DEFAULT_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown feature profile: {profile}")
+
+    if sample_rate is None:
+        source, sample_rate = decode_audio(source)
+    data, sample_rate = prepare_audio(source, sample_rate)
+    if profile == 'inference':
+        # 원본과 노이즈 버전은 길이가 같으므로 STFT 를 한 번에 계산
+        res12 = extract_features_batch(np.stack((data, seeded_noise(data))), sample_rate)
+        res3 = extract_features(approx_stretch_pitch(data, sample_rate), sample_rate)
+        return np.concatenate((res12[0], res12[1], res3), axis=0)
+
+    res1 = extract_features(data, sample_rate)
+    result = np.array(res1)
+    noise_data = noise(data)
+    res2 = extract_features(noise_data, sample_rate)
+    result = np.concatenate((result, res2), axis=0)
+    new_data = stretch(data, STRETCH_RATE)
+    data_stretch_pitch = pitch(new_data, sample_rate, PITCH_STEPS)
+    res3 = extract_features(data_stretch_pitch, sample_rate)
+    result = np.concatenate((result, res3), axis=0)
+    return result
+
+
+# 기존 구현과의 오차 확인 및 속도 비교
+# 사용법: python features.py [wav 파일 ...]
+def check_equivalence(clips, sample_rate, rtol=1e-5, atol=1e-6):
+    max_err = 0.0
+    for clip in clips:
+        expected = extract_features_reference(clip, sample_rate)
+        actual = extract_features(clip, sample_rate)
+        np.testing.assert_allclose(actual, expected, rtol=rtol, atol=atol)
+        max_err = max(max_err, float(np.max(np.abs(actual - expected))))
+    lengths = {len(clip) for clip in clips}
+    if len(lengths) == 1:
+        batched = extract_features_batch(np.stack(clips), sample_rate)
+        for clip, row in zip(clips, batched):
+            np.testing.assert_allclose(row, extract_features_reference(clip, sample_rate),
+                                       rtol=rtol, atol=atol)
+    return max_err
+
+
+if __name__ == '__main__':
+    import sys
+
+    sr = 22050
+    if len(sys.argv) > 1:
+        clips = [librosa.load(p, duration=2.5)[0] for p in sys.argv[1:]]
+    else:
+        rng = np.random.default_rng(0)
+        clips = [rng.standard_normal(int(sr * 2.5)).astype(np.float32) * 0.1 for _ in range(8)]
+
+    print("max abs error:", check_equivalence(clips, sr))
+    for name, fn in [('reference', extract_features_reference), ('engine', extract_features)]:
+        started = time.perf_counter()
+        for clip in clips:
+            fn(clip, sr)
+        print(f"{name}: {(time.perf_counter() - started) / len(clips) * 1000:.1f} ms/clip")
+
+    # stretch/pitch 블록: 학습 경로 대비 근사의 특성 그룹별 상대 오차 (중앙값)
+    groups = {'zcr': slice(0, 1), 'chroma': slice(1, 13), 'mfcc': slice(13, 33),
+              'rms': slice(33, 34), 'mel': slice(34, None)}
+    timings = {'training': 0.0, 'inference': 0.0}
+    errors = {name: [] for name in groups}
+    for clip in clips:
+        started = time.perf_counter()
+        expected = extract_features(pitch(stretch(clip, STRETCH_RATE), sr, PITCH_STEPS), sr)
+        timings['training'] += time.perf_counter() - started
+        started = time.perf_counter()
+        actual = extract_features(approx_stretch_pitch(clip, sr), sr)
+        timings['inference'] += time.perf_counter() - started
+        for name, part in groups.items():
+            errors[name].append(np.median(np.abs(actual[part] - expected[part]) / (np.abs(expected[part]) + 1e-8)))
+    print("stretch/pitch block:", ", ".join(f"{k} {v / len(clips) * 1000:.1f} ms" for k, v in timings.items()))
+    print("  relative error:", ", ".join(f"{name} {np.median(e):.3f}" for name, e in errors.items()))
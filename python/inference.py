@@ -0,0 +1,36 @@
+import numpy as np
+
+from batching import MicroBatcher
+
+
+EMOTIONS = ['angry', 'anxious', 'embarrassed', 'happy', 'hurt', 'neutrality', 'sad']
+
+
+# 멀티모달 감정 모델 추론 스케줄러
+# 여러 요청의 특성 벡터를 최대 max_wait_ms 또는 max_batch_size 개까지 모아 한 번의 predict 로 처리한다.
+class EmotionClassifier:
+    def __init__(self, registry, model_key='emotion_model', scaler_key='scaler',
+                 max_batch_size=16, max_wait_ms=5, runner=None):
+        self.registry = registry
+        self.model_key = model_key
+        self.scaler_key = scaler_key
+        self.batcher = MicroBatcher(self._predict_batch, max_batch_size=max_batch_size,
+                                    max_wait_ms=max_wait_ms, runner=runner)
+
+    def _predict_batch(self, rows):
+        X = self.registry.get(self.scaler_key).transform(np.vstack(rows))
+        X = np.expand_dims(X, axis=2)
+        model = self.registry.get(self.model_key)
+        with self.registry.lock(self.model_key):
+            predictions = model.predict(X, batch_size=len(rows), verbose=0)
+        return list(predictions)
+
+    # 특성 벡터 한 줄(오디오 특성 + 문장 임베딩)에 대한 클래스별 확률
+    async def predict(self, row):
+        return await self.batcher.submit(np.asarray(row, dtype=np.float64).reshape(1, -1))
+
+    async def predict_label(self, row):
+        return int(np.argmax(await self.predict(row)))
+
+    def stats(self):
+        return self.batcher.metrics.snapshot()
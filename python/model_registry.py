@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+
+# 현재 프로세스의 RSS(byte) 조회
+def _rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        # /proc 이 없는 환경(macOS 등)에서는 최대 RSS 로 대체
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelEntry:
+    def __init__(self, name, loader, warmup=None):
+        self.name = name
+        self.loader = loader
+        self.warmup = warmup
+        self.instance = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self.memory_bytes = None
+        self.error = None
+        # 로딩은 한 번만, 추론은 모델별 락으로 직렬화
+        self.load_lock = threading.Lock()
+        self.lock = threading.RLock()
+
+
+# 프로세스 단위 모델 레지스트리
+# 모델은 처음 요청될 때 한 번만 로드되고, 이후 모든 엔드포인트가 같은 인스턴스를 공유한다.
+class ModelRegistry:
+    def __init__(self):
+        self._entries = {}
+
+    def register(self, name, loader, warmup=None):
+        self._entries[name] = ModelEntry(name, loader, warmup)
+
+    def get(self, name):
+        entry = self._entries[name]
+        if entry.instance is not None:
+            return entry.instance
+
+        with entry.load_lock:
+            if entry.instance is None:
+                rss_before = _rss_bytes()
+                started = time.perf_counter()
+                try:
+                    instance = entry.loader()
+                except Exception as e:
+                    entry.error = str(e)
+                    raise
+                entry.load_seconds = time.perf_counter() - started
+                entry.memory_bytes = max(_rss_bytes() - rss_before, 0)
+                entry.error = None
+                entry.instance = instance
+                print(f"model loaded: {name} ({entry.load_seconds:.2f}s)")
+        return entry.instance
+
+    # 모델 인스턴스를 동시 요청에서 안전하게 쓰기 위한 락
+    def lock(self, name):
+        return self._entries[name].lock
+
+    def names(self):
+        return list(self._entries)
+
+    def is_loaded(self, name):
+        return self._entries[name].instance is not None
+
+    # 더미 입력으로 한 번 실행해 첫 요청의 지연을 없앤다
+    def warmup(self, names=None):
+        for name in names or list(self._entries):
+            entry = self._entries[name]
+            instance = self.get(name)
+            if entry.warmup is None:
+                continue
+            started = time.perf_counter()
+            with entry.lock:
+                entry.warmup(instance)
+            entry.warmup_seconds = time.perf_counter() - started
+
+    def stats(self):
+        result = {}
+        for name, entry in self._entries.items():
+            result[name] = {
+                "loaded": entry.instance is not None,
+                "load_seconds": entry.load_seconds,
+                "warmup_seconds": entry.warmup_seconds,
+                "memory_bytes": entry.memory_bytes,
+                "error": entry.error,
+            }
+        return result
+
+
+registry = ModelRegistry()
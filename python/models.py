@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, LargeBinary, SmallInteger, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, LargeBinary, SmallInteger, DateTime, Index
+from sqlalchemy.dialects.mysql import MEDIUMTEXT
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -13,10 +14,38 @@ class CycleData(Base):
     
 class Realtime_log(Base):
     __tablename__ = 'realtime_log'
+    __table_args__ = (
+        Index('ix_realtime_log_logged_at', 'logged_at'),
+        Index('ix_realtime_log_label_logged_at', 'label', 'logged_at'),
+    )
     
     timemap = Column(String(40), primary_key=True, nullable=False)
     label = Column(String(20), nullable=False)
     decibel = Column(SmallInteger, nullable=False)
+    # timemap 끝의 측정 시각 (위도+경도+"YYYY-MM-DD-HH:MM:SS")
+    logged_at = Column(DateTime, nullable=True)
+
+# realtime_log 시간/일 단위 집계 (rollup.py)
+class Noise_rollup(Base):
+    __tablename__ = 'noise_rollup'
+
+    granularity = Column(String(4), primary_key=True, nullable=False)   # hour / day
+    bucket = Column(DateTime, primary_key=True, nullable=False)
+    label = Column(String(20), primary_key=True, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    decibel_sum = Column(BigInteger, nullable=False, default=0)
+    decibel_min = Column(SmallInteger, nullable=False)
+    decibel_max = Column(SmallInteger, nullable=False)
+
+# 백분위 계산용 데시벨 분포
+class Noise_rollup_histogram(Base):
+    __tablename__ = 'noise_rollup_histogram'
+
+    granularity = Column(String(4), primary_key=True, nullable=False)
+    bucket = Column(DateTime, primary_key=True, nullable=False)
+    label = Column(String(20), primary_key=True, nullable=False)
+    decibel = Column(SmallInteger, primary_key=True, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
 
 class User_info(Base):
     __tablename__ = 'user_info'
@@ -44,6 +73,27 @@ class Push_alert(Base):
     uuid = Column(String(36), nullable=False)
     token = Column(String(255), nullable=False, primary_key=True)
     permission = Column(String(5), nullable=False)
-    
-    
-    
+
+
+class Notification_outbox(Base):
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    title = Column(String(100), nullable=False)
+    body = Column(String(255), nullable=False)
+    audience = Column(String(20), nullable=False, default='subscribers')
+    # pending -> sending -> sent / failed
+    status = Column(String(10), nullable=False, default='pending')
+    attempts = Column(SmallInteger, nullable=False, default=0)
+    # 재시도할 토큰 목록 (JSON), 없으면 audience 전체
+    # 전체 발송에서 실패한 토큰이 수백 개면 TEXT(64KB) 를 넘으므로 MEDIUMTEXT
+    retry_tokens = Column(MEDIUMTEXT, nullable=True)
+    sent_count = Column(Integer, nullable=False, default=0)
+    failed_count = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.now)
+    sent_at = Column(DateTime, nullable=True)
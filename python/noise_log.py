@@ -0,0 +1,85 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import bindparam, select, update
+
+from models import Realtime_log
+
+
+TIMEMAP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})[-T ](\d{2}:\d{2}:\d{2})')
+
+
+# timemap(위도+경도+측정시각) 에서 측정 시각 추출
+def parse_timemap(timemap):
+    match = TIMEMAP_PATTERN.search(timemap or '')
+    if match is None:
+        return None
+    try:
+        return datetime.strptime(f"{match.group(1)} {match.group(2)}", "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+# 측정 시각 / 라벨 범위 조회 (logged_at 인덱스 범위 스캔)
+def noise_query(start=None, end=None, label=None):
+    query = select(Realtime_log)
+    if label:
+        query = query.where(Realtime_log.label == label)
+    if start is not None:
+        query = query.where(Realtime_log.logged_at >= start)
+    if end is not None:
+        query = query.where(Realtime_log.logged_at <= end)
+    return query
+
+
+# 기존 행의 logged_at 채우기 (sql/migrate_realtime_log_logged_at.sql 이후 실행)
+# timemap 순서로 batch_size 씩 읽어서 갱신하므로 중간에 멈춰도 다시 실행하면 이어서 진행된다.
+async def backfill_logged_at(session, batch_size=5000):
+    updated = 0
+    unparsed = 0
+    last = ''
+    while True:
+        rows = (await session.execute(select(Realtime_log.timemap).where(
+            Realtime_log.logged_at.is_(None),
+            Realtime_log.timemap > last,
+        ).order_by(Realtime_log.timemap).limit(batch_size))).all()
+        if not rows:
+            break
+        values = []
+        for (timemap,) in rows:
+            logged_at = parse_timemap(timemap)
+            if logged_at is None:
+                unparsed += 1
+            else:
+                values.append({"b_timemap": timemap, "b_logged_at": logged_at})
+        if values:
+            table = Realtime_log.__table__
+            await (await session.connection()).execute(
+                update(table).where(table.c.timemap == bindparam('b_timemap'))
+                .values(logged_at=bindparam('b_logged_at')),
+                values,
+            )
+        await session.commit()
+        updated += len(values)
+        last = rows[-1][0]
+        print(f"backfill: {updated} updated, {unparsed} unparsed")
+    return updated, unparsed
+
+
+async def _main():
+    from database import async_db_conn
+
+    db = async_db_conn()
+    async with db.sessionmaker() as session:
+        await backfill_logged_at(session)
+    await db.dispose()
+
+
+if __name__ == '__main__':
+    import asyncio
+    import sys
+
+    if sys.argv[1:] != ['backfill']:
+        print("usage: python noise_log.py backfill")
+        sys.exit(1)
+    asyncio.run(_main())
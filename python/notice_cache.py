@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+from pydantic import BaseModel, ConfigDict
+
+
+# 공지 한 건의 응답 형식 (ORM 행에서 바로 만든다)
+class NoticeItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    no: int
+    title: str
+    content: str | None
+    date: datetime
+    file: str | None
+
+
+def notice_to_dict(row):
+    return NoticeItem.model_validate(row).model_dump()
+
+
+def _dumps(payload):
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _etag(body):
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+# 공지 목록의 메타데이터 (no, title, 내용 해시) 스냅샷
+# 공지 본문에는 base64 이미지(file)가 들어가므로 본문은 캐시하지 않고, 304 가 아닐 때만 DB 에서 읽는다.
+class NoticeSnapshot:
+    def __init__(self, items, version, last_modified):
+        self.version = version
+        self.last_modified = last_modified
+        self.items = items                                   # no 오름차순, {"no", "title", "digest"}
+        self.digests = {item["no"]: item["digest"] for item in items}
+        self.etag = self._etag_of('list', items)
+        self._first = None
+        if items:
+            body = _dumps({"title": items[-1]["title"]})
+            self._first = (body, _etag(body))
+
+    @staticmethod
+    def _etag_of(kind, items, extra=''):
+        key = kind + extra + ''.join(f"\n{item['no']}:{item['digest']}" for item in items)
+        return _etag(key.encode('utf-8'))
+
+    # 전체 목록 (format 마다 표현이 다르므로 ETag 도 따로)
+    def list_etag(self, format='json'):
+        return self.etag if format == 'json' else self._etag_of(format, self.items)
+
+    def first(self):
+        return self._first
+
+    # 공지 한 건의 ETag, 없는 공지면 None
+    def item_etag(self, no):
+        digest = self.digests.get(no)
+        return _etag(f"item{no}:{digest}".encode('utf-8')) if digest is not None else None
+
+    # 키셋 페이지 (after 다음 limit 개 + 다음 페이지 유무)
+    def page_etag(self, after, limit):
+        rows = [item for item in self.items if after is None or item["no"] > after][:limit + 1]
+        return self._etag_of('page', rows, extra=str(limit))
+
+
+# 공지사항 읽기 캐시 (ETag / Last-Modified 계산용 메타데이터만)
+# 전체 공지의 메타데이터를 한 번 읽어 두고, 쓰기(등록/수정/삭제) 후 invalidate() 로 버전을 올린다.
+# 워커가 여러 개면 다른 워커의 쓰기는 보이지 않으므로 ttl 초가 지나면 다시 읽는다.
+# ETag 는 내용 해시라서 워커마다 따로 읽어도 같은 내용이면 같은 값이 된다.
+class NoticeCache:
+    def __init__(self, load_fn, ttl=60.0):
+        # load_fn() -> [{"no", "title", "digest"}, ...] (코루틴 함수)
+        self.load_fn = load_fn
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.not_modified = 0
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self):
+        return (self._snapshot is not None and self._snapshot.version == self.version
+                and time.monotonic() - self._loaded_at < self.ttl)
+
+    async def get(self):
+        if self._fresh():
+            self.hits += 1
+            return self._snapshot
+        async with self._lock:
+            if self._fresh():
+                self.hits += 1
+                return self._snapshot
+            version = self.version
+            items = sorted(await self.load_fn(), key=lambda item: item["no"])
+            previous = self._snapshot
+            snapshot = NoticeSnapshot(items, version, datetime.now(timezone.utc).replace(microsecond=0))
+            # 내용이 그대로면 Last-Modified 도 그대로 둔다
+            if previous is not None and previous.etag == snapshot.etag:
+                snapshot.last_modified = previous.last_modified
+            self.loads += 1
+            # 읽는 도중 invalidate 되었으면 이번 결과는 이 호출에만 쓰고 저장하지 않는다
+            if version == self.version:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+            return snapshot
+
+    # commit 이후 호출
+    def invalidate(self):
+        self.version += 1
+        self.invalidations += 1
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            "version": self.version,
+            "cached": self._fresh(),
+            "size": len(snapshot.items) if snapshot else 0,
+            "etag": snapshot.etag if snapshot else None,
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "not_modified": self.not_modified,
+            "ttl": self.ttl,
+        }
+
+
+def _etag_matches(header, etag):
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+
+def _not_modified_since(header, last_modified):
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+
+# If-None-Match 가 있으면 그것만, 없으면 If-Modified-Since 로 304 여부를 정한다
+# body 는 bytes 이거나, 304 가 아닐 때만 호출해서 본문(bytes 또는 Response)을 만드는 코루틴 함수
+async def conditional_response(cache, request, body, etag, last_modified, media_type='application/json'):
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if_none_match = request.headers.get('if-none-match')
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_none_match is not None:
+        unchanged = _etag_matches(if_none_match, etag)
+    else:
+        unchanged = if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+    if unchanged:
+        cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    if callable(body):
+        body = await body()
+    if isinstance(body, Response):
+        body.headers.update(headers)
+        return body
+    return Response(content=body, media_type=media_type, headers=headers)
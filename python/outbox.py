@@ -0,0 +1,141 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models import Notification_outbox
+
+
+# 알림 outbox
+# 요청 처리 중에는 같은 트랜잭션에 outbox 행만 추가하고 바로 응답한다.
+# 백그라운드 워커가 배치 단위로 행을 가져가(FOR UPDATE SKIP LOCKED) 발송하고 결과를 기록한다.
+# 발송 중(sending) 상태로 lease_seconds 이상 남은 행은 워커가 죽은 것으로 보고 다시 가져간다.
+class NotificationOutbox:
+    def __init__(self, session_factory, deliver, workers=2, batch_size=20, poll_interval=5.0,
+                 max_attempts=5, backoff=30.0, lease_seconds=300):
+        self.session_factory = session_factory
+        # deliver(title, body, audience, tokens) -> push.DispatchResult (코루틴 함수)
+        self.deliver = deliver
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lease_seconds = lease_seconds
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self._wakeup = None
+        self._tasks = []
+
+    # 호출한 쪽의 세션에 추가만 한다 (commit 은 호출한 쪽에서)
+    def enqueue(self, session, title, body, audience='subscribers'):
+        message = Notification_outbox(title=title, body=body, audience=audience,
+                                      status='pending', attempts=0,
+                                      next_attempt_at=datetime.now())
+        session.add(message)
+        return message
+
+    # commit 이후 호출해서 워커를 바로 깨운다
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self):
+        async with self.session_factory() as session:
+            now = datetime.now()
+            rows = (await session.execute(select(Notification_outbox).where(
+                Notification_outbox.status.in_(('pending', 'sending')),
+                Notification_outbox.next_attempt_at <= now,
+            ).order_by(Notification_outbox.id).limit(self.batch_size).with_for_update(skip_locked=True))).scalars().all()
+            claimed = []
+            for row in rows:
+                row.status = 'sending'
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=self.lease_seconds)
+                tokens = json.loads(row.retry_tokens) if row.retry_tokens else None
+                claimed.append((row.id, row.title, row.body, row.audience, tokens, row.attempts))
+            await session.commit()
+            return claimed
+
+    async def _record(self, message_id, attempts, result=None, error=None):
+        async with self.session_factory() as session:
+            row = await session.get(Notification_outbox, message_id)
+            if result is not None:
+                row.sent_count += len(result.sent)
+                failed = list(result.failed)
+                row.failed_count = len(failed)
+                error = "; ".join(f"{token}: {reason}" for token, reason in list(result.failed.items())[:5]) or None
+            else:
+                failed = None
+
+            if error is None:
+                row.status = 'sent'
+                row.sent_at = datetime.now()
+                row.retry_tokens = None
+                self.delivered += 1
+            elif attempts >= self.max_attempts:
+                row.status = 'failed'
+                self.failed += 1
+            else:
+                # 실패한 토큰에만 다시 보낸다
+                row.status = 'pending'
+                row.next_attempt_at = datetime.now() + timedelta(seconds=self.backoff * 2 ** (attempts - 1))
+                if failed is not None:
+                    row.retry_tokens = json.dumps(failed)
+                self.retried += 1
+            row.last_error = error
+            await session.commit()
+
+    async def _process(self, message):
+        message_id, title, body, audience, tokens, attempts = message
+        try:
+            result = await self.deliver(title, body, audience, tokens)
+        except Exception as e:
+            await self._record(message_id, attempts, error=f"{type(e).__name__}: {e}")
+        else:
+            await self._record(message_id, attempts, result=result)
+
+    async def _worker(self):
+        while True:
+            try:
+                batch = await self._claim()
+                if batch:
+                    results = await asyncio.gather(*(self._process(message) for message in batch),
+                                                   return_exceptions=True)
+                    for error in results:
+                        # 결과 기록에 실패한 행은 lease 가 끝나면 다시 가져간다
+                        if isinstance(error, Exception):
+                            print(f"outbox record failed: {error}")
+                    continue
+            except Exception as e:
+                print(f"outbox worker failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.get_running_loop().create_task(self._worker()) for _ in range(self.workers)]
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+    async def status_counts(self):
+        async with self.session_factory() as session:
+            rows = (await session.execute(
+                select(Notification_outbox.status, func.count()).group_by(Notification_outbox.status))).all()
+            return {status: count for status, count in rows}
+
+    def stats(self):
+        return {
+            "workers": len(self._tasks),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
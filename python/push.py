@@ -0,0 +1,132 @@
+import asyncio
+import inspect
+import random
+import time
+
+import httpx
+
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class DispatchResult:
+    def __init__(self):
+        self.sent = []
+        self.failed = {}          # token -> 실패 사유
+        self.unregistered = []    # FCM 이 더 이상 유효하지 않다고 알려준 토큰
+        self.retries = 0
+        self.elapsed = 0.0
+
+    def to_dict(self):
+        return {
+            "sent": len(self.sent),
+            "failed": self.failed,
+            "unregistered": self.unregistered,
+            "retries": self.retries,
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+        }
+
+
+def _fcm_error_code(response):
+    try:
+        error = response.json().get("error", {})
+    except ValueError:
+        return None
+    for detail in error.get("details", []):
+        if detail.get("errorCode"):
+            return detail["errorCode"]
+    return error.get("status")
+
+
+# FCM HTTP v1 동시 발송기
+# keep-alive 커넥션 풀을 공유하고, 토큰별 결과를 모으며, 429/5xx 는 백오프 후 재시도한다.
+class FcmDispatcher:
+    def __init__(self, url, access_token, concurrency=100, max_retries=3, backoff=0.5,
+                 timeout=10.0, on_unregistered=None):
+        self.url = url
+        # 액세스 토큰을 돌려주는 함수 (동기 함수 또는 코루틴 함수)
+        self.access_token = access_token
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        # 만료된 토큰 목록을 받아 DB 에서 지우는 콜백
+        self.on_unregistered = on_unregistered
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(max_connections=self.concurrency,
+                                  max_keepalive_connections=self.concurrency)
+            self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _get_access_token(self):
+        if inspect.iscoroutinefunction(self.access_token):
+            return await self.access_token()
+        return await asyncio.to_thread(self.access_token)
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def _send_one(self, token, notification, headers, semaphore, result):
+        message = {"message": {"token": token, "notification": notification}}
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                try:
+                    response = await self.client.post(self.url, headers=headers, json=message)
+                except httpx.TransportError as e:
+                    reason = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code == 200:
+                        result.sent.append(token)
+                        return
+                    code = _fcm_error_code(response)
+                    if code == "UNREGISTERED" or response.status_code == 404:
+                        result.unregistered.append(token)
+                        return
+                    reason = f"{response.status_code} {code or response.text[:200]}"
+                    if response.status_code not in RETRY_STATUS:
+                        break
+
+                if attempt < self.max_retries:
+                    result.retries += 1
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+            result.failed[token] = reason
+
+    async def send(self, tokens, title, body):
+        result = DispatchResult()
+        started = time.perf_counter()
+        if tokens:
+            headers = {
+                'Authorization': f'Bearer {await self._get_access_token()}',
+                'Content-Type': 'application/json',
+            }
+            notification = {"title": title, "body": body}
+            semaphore = asyncio.Semaphore(self.concurrency)
+            await asyncio.gather(*(self._send_one(token, notification, headers, semaphore, result)
+                                   for token in tokens))
+
+        if result.unregistered and self.on_unregistered is not None:
+            try:
+                outcome = self.on_unregistered(result.unregistered)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            except Exception as e:
+                print(f"failed to prune unregistered tokens: {e}")
+
+        result.elapsed = time.perf_counter() - started
+        print(f"push: {len(result.sent)} sent, {len(result.failed)} failed, "
+              f"{len(result.unregistered)} unregistered ({result.elapsed:.2f}s)")
+        return result
@@ -0,0 +1,172 @@
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, delete, func, literal, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+from models import Noise_rollup, Noise_rollup_histogram, Realtime_log
+
+
+GRANULARITIES = ('hour', 'day')
+PERCENTILES = (50, 90, 95)
+
+
+def bucket_start(logged_at, granularity):
+    if granularity == 'hour':
+        return logged_at.replace(minute=0, second=0, microsecond=0)
+    return logged_at.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# 이벤트 [(logged_at, label, decibel), ...] 를 시간/일 버킷별로 미리 합친다
+def _aggregate(events):
+    totals = {}
+    histogram = defaultdict(int)
+    for logged_at, label, decibel in events:
+        if logged_at is None:
+            continue
+        for granularity in GRANULARITIES:
+            key = (granularity, bucket_start(logged_at, granularity), label)
+            if key in totals:
+                count, total, low, high = totals[key]
+                totals[key] = (count + 1, total + decibel, min(low, decibel), max(high, decibel))
+            else:
+                totals[key] = (1, decibel, decibel, decibel)
+            histogram[key + (decibel,)] += 1
+    return totals, histogram
+
+
+# /realtimeInsert 와 같은 트랜잭션에서 집계 테이블을 갱신한다 (commit 은 호출한 쪽에서)
+async def apply_rollup(session, events):
+    totals, histogram = _aggregate(events)
+    if not totals:
+        return
+
+    table = Noise_rollup.__table__
+    stmt = mysql_insert(table).values([
+        {"granularity": g, "bucket": b, "label": l, "count": c,
+         "decibel_sum": s, "decibel_min": lo, "decibel_max": hi}
+        for (g, b, l), (c, s, lo, hi) in totals.items()
+    ])
+    await session.execute(stmt.on_duplicate_key_update(
+        count=table.c['count'] + stmt.inserted['count'],
+        decibel_sum=table.c.decibel_sum + stmt.inserted.decibel_sum,
+        decibel_min=func.least(table.c.decibel_min, stmt.inserted.decibel_min),
+        decibel_max=func.greatest(table.c.decibel_max, stmt.inserted.decibel_max),
+    ))
+
+    table = Noise_rollup_histogram.__table__
+    stmt = mysql_insert(table).values([
+        {"granularity": g, "bucket": b, "label": l, "decibel": d, "count": c}
+        for (g, b, l, d), c in histogram.items()
+    ])
+    await session.execute(stmt.on_duplicate_key_update(count=table.c['count'] + stmt.inserted['count']))
+
+
+def _bucket_expr(granularity):
+    if granularity == 'hour':
+        return func.date_format(Realtime_log.logged_at, '%Y-%m-%d %H:00:00')
+    return func.date(Realtime_log.logged_at)
+
+
+def _range_filter(column, start, end):
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column <= end)
+    return and_(*conditions) if conditions else literal(True)
+
+
+# realtime_log 에서 집계를 다시 만든다 (버킷 경계에 맞춰 start/end 를 지정할 것)
+async def rebuild(session, start=None, end=None):
+    for granularity in GRANULARITIES:
+        for model in (Noise_rollup, Noise_rollup_histogram):
+            await session.execute(delete(model).where(
+                model.granularity == granularity,
+                _range_filter(model.bucket, start, end),
+            ))
+
+        bucket = _bucket_expr(granularity)
+        source = Realtime_log.logged_at.isnot(None), _range_filter(Realtime_log.logged_at, start, end)
+        await session.execute(Noise_rollup.__table__.insert().from_select(
+            ['granularity', 'bucket', 'label', 'count', 'decibel_sum', 'decibel_min', 'decibel_max'],
+            select(literal(granularity), bucket, Realtime_log.label, func.count(),
+                   func.sum(Realtime_log.decibel), func.min(Realtime_log.decibel),
+                   func.max(Realtime_log.decibel))
+            .where(*source).group_by(bucket, Realtime_log.label),
+        ))
+        await session.execute(Noise_rollup_histogram.__table__.insert().from_select(
+            ['granularity', 'bucket', 'label', 'decibel', 'count'],
+            select(literal(granularity), bucket, Realtime_log.label, Realtime_log.decibel, func.count())
+            .where(*source).group_by(bucket, Realtime_log.label, Realtime_log.decibel),
+        ))
+    await session.commit()
+
+
+def _percentile(histogram, total, q):
+    rank = max(1, -(-q * total // 100))   # nearest-rank
+    seen = 0
+    for decibel in sorted(histogram):
+        seen += histogram[decibel]
+        if seen >= rank:
+            return decibel
+    return None
+
+
+# 집계 조회: 버킷 수에 비례하는 비용 (원본 이벤트 수와 무관)
+async def query_rollups(session, granularity, start=None, end=None, label=None):
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of {GRANULARITIES}")
+
+    rows = select(Noise_rollup).where(
+        Noise_rollup.granularity == granularity,
+        _range_filter(Noise_rollup.bucket, start, end),
+    )
+    hist = select(Noise_rollup_histogram).where(
+        Noise_rollup_histogram.granularity == granularity,
+        _range_filter(Noise_rollup_histogram.bucket, start, end),
+    )
+    if label:
+        rows = rows.where(Noise_rollup.label == label)
+        hist = hist.where(Noise_rollup_histogram.label == label)
+
+    distributions = defaultdict(dict)
+    for h in (await session.execute(hist)).scalars():
+        distributions[(h.bucket, h.label)][h.decibel] = h.count
+
+    result = []
+    for row in (await session.execute(rows.order_by(Noise_rollup.bucket, Noise_rollup.label))).scalars():
+        distribution = distributions.get((row.bucket, row.label), {})
+        item = {
+            "bucket": row.bucket,
+            "label": row.label,
+            "count": row.count,
+            "decibel_min": row.decibel_min,
+            "decibel_avg": round(row.decibel_sum / row.count, 2) if row.count else None,
+            "decibel_max": row.decibel_max,
+        }
+        for q in PERCENTILES:
+            item[f"decibel_p{q}"] = _percentile(distribution, row.count, q)
+        result.append(item)
+    return result
+
+
+async def _main(args):
+    from database import async_db_conn
+
+    db = async_db_conn()
+    async with db.sessionmaker() as session:
+        await rebuild(session, args.start, args.end)
+    await db.dispose()
+    print("rollups rebuilt")
+
+
+if __name__ == '__main__':
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="noise rollup maintenance")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--from', dest='start', type=datetime.fromisoformat)
+    parser.add_argument('--to', dest='end', type=datetime.fromisoformat)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+from embedding import normalize_text
+
+
+class SpeculationStats:
+    def __init__(self):
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.saved_total = 0.0
+
+    def snapshot(self):
+        finals = self.hits + self.misses
+        return {
+            "started": self.started,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "hit_rate": self.hits / finals if finals else None,
+            "avg_saved_ms": round(self.saved_total / self.hits * 1000, 1) if self.hits else None,
+            "saved_seconds": round(self.saved_total, 3),
+        }
+
+
+class _Entry:
+    def __init__(self, task):
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished = None
+
+
+# 중간(interim) STT 결과로 텍스트 단계(감성 분류 + 임베딩)를 미리 실행한다 (세션마다 하나)
+# stability 가 threshold 이상인 중간 결과가 오면 그 문장으로 run(text) 를 시작해 두고,
+# 최종 결과의 문장이 같으면 그 결과를 그대로 쓰고 (hit), 다르면 미리 시작한 작업은 취소한다.
+# 절약한 시간 = 최종 결과 시점에 이미 진행된 만큼 (끝났으면 작업 전체 시간)
+class Speculator:
+    def __init__(self, run, stats, threshold=0.8, max_inflight=2):
+        # run(text) -> 텍스트 단계 결과 (코루틴 함수)
+        self.run = run
+        self.stats = stats
+        self.threshold = threshold
+        self.max_inflight = max_inflight
+        self._entries = {}
+
+    def _cancel(self, key):
+        entry = self._entries.pop(key)
+        if not entry.task.done():
+            entry.task.cancel()
+            self.stats.cancelled += 1
+
+    def observe(self, text, stability):
+        if stability < self.threshold:
+            return
+        key = normalize_text(text)
+        if not key or key in self._entries:
+            return
+        # 가장 오래된 추측부터 취소해서 진행 중인 작업 수를 제한한다
+        while len(self._entries) >= self.max_inflight:
+            self._cancel(next(iter(self._entries)))
+        entry = _Entry(asyncio.get_running_loop().create_task(self.run(text)))
+        entry.task.add_done_callback(lambda _: setattr(entry, 'finished', time.perf_counter()))
+        self._entries[key] = entry
+        self.stats.started += 1
+
+    # 최종 결과: 맞는 추측이 있으면 그 작업을, 없으면 None 을 돌려주고 나머지는 취소한다
+    def take(self, text):
+        entry = self._entries.pop(normalize_text(text), None)
+        for key in list(self._entries):
+            self._cancel(key)
+        if entry is None or entry.task.cancelled():
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self.stats.saved_total += (entry.finished or time.perf_counter()) - entry.started
+        return entry.task
+
+    # 분석하지 않는 최종 결과 (빈 문장 등): 적중/실패로 세지 않고 진행 중인 추측만 취소한다
+    def discard(self):
+        for key in list(self._entries):
+            self._cancel(key)
+
+    def close(self):
+        self.discard()
@@ -0,0 +1,303 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+
+from starlette.websockets import WebSocketDisconnect
+
+from audio_buffer import PcmRingBuffer
+from speculation import Speculator, SpeculationStats
+from vad import VoiceGate, VadStats
+
+
+class SessionLimitExceeded(Exception):
+    pass
+
+
+# 단계별 지연 시간 (초 단위로 기록, ms 로 보고)
+class StageStats:
+    def __init__(self, window=512):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+
+    def snapshot(self):
+        recent = sorted(self._recent)
+
+        def pct(q):
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 1) if recent else None
+
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 1) if self.count else None,
+            "p50_ms": pct(0.5),
+            "p95_ms": pct(0.95),
+            "max_ms": round(self.max * 1000, 1),
+        }
+
+
+class Utterance:
+    def __init__(self, text, audio, end_ms, text_task=None):
+        self.text = text
+        self.audio = audio
+        self.end_ms = end_ms
+        # 중간 결과로 미리 시작한 텍스트 단계 작업 (speculation.py)
+        self.text_task = text_task
+        self.received = time.perf_counter()
+        self.emotion = asyncio.get_running_loop().create_future()
+
+
+# /ws 연결 하나의 상태와 처리 파이프라인
+#
+#   ingest  : websocket -> (VAD) -> 링 버퍼 + 오디오 큐 (큐가 차면 websocket 에서 더 읽지 않는다)
+#   stt     : 오디오 큐 -> VITO 스트림, 최종 결과마다 발화 구간을 잘라 분석 큐와 전송 큐에 넣는다
+#   emotion : 분석 큐 -> 감정 분석 (analysis_workers 개가 동시에)
+#   send    : 전송 큐 순서대로 분석 결과를 기다렸다가 websocket 으로 보낸다 (발화 순서 유지)
+#
+# STT 결과는 분석을 기다리지 않고 계속 읽는다. 분석 큐가 가득 차면 그 발화는
+# 감정 분석 없이 텍스트만 보낸다 (추론이 느려도 STT 는 실시간을 유지).
+# speculator 가 있으면 안정된 중간 결과로 텍스트 단계를 미리 시작한다.
+class StreamSession:
+    def __init__(self, session_id, websocket, stt_client, analyze, metrics, sample_rate, capacity_ms,
+                 max_pending, analysis_workers=2, audio_queue=50, speculator=None, vad=None):
+        self.id = session_id
+        self.websocket = websocket
+        self.stt_client = stt_client
+        # analyze(text, audio, text_task) -> 감정 라벨 (코루틴 함수)
+        self.analyze = analyze
+        self.speculator = speculator
+        # 침묵을 줄인 오디오만 STT 로 보내고 링 버퍼에도 같은 오디오를 쌓는다 (vad.py)
+        self.vad = vad
+        self.metrics = metrics
+        self.buffer = PcmRingBuffer(sample_rate, capacity_ms=capacity_ms)
+        self.analysis_workers = analysis_workers
+        self._audio_q = asyncio.Queue(audio_queue)
+        self.max_pending = max_pending
+        self._work_q = asyncio.Queue()
+        self._send_q = asyncio.Queue()
+        self._forwarded_at = deque(maxlen=1024)   # (링 버퍼 끝 위치, 보낸 시각)
+        self.started_at = time.time()
+        self.utterances = 0
+        self.shed = 0
+        self.sent = 0
+
+    @property
+    def pending(self):
+        return self.utterances - self.sent
+
+    async def _ingest(self):
+        try:
+            async for chunk in self.websocket.iter_bytes():
+                if self.vad is not None:
+                    chunk = self.vad.process(chunk)
+                    if not chunk:
+                        continue
+                self.buffer.append(chunk)
+                started = time.perf_counter()
+                self._forwarded_at.append((self.buffer.end, started))
+                await self._audio_q.put(chunk)
+                self.metrics['ingest'].add(time.perf_counter() - started)
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            print(f"session {self.id}: ingest failed: {e}")
+        await self._audio_q.put(None)
+
+    async def _audio(self):
+        while True:
+            chunk = await self._audio_q.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    def _discard_speculation(self):
+        if self.speculator is not None:
+            self.speculator.discard()
+
+    def _on_final(self, result):
+        alternative = result.alternatives[0]
+        text = alternative.text
+        # 빈 최종 결과는 추측 적중률에 넣지 않는다
+        if text == '' or not alternative.words:
+            self._discard_speculation()
+            return
+        start_time = alternative.words[0].start_at
+        end_time = alternative.words[-1].start_at + alternative.words[-1].duration
+
+        # 분석이 끝나기 전에 링 버퍼가 덮어쓸 수 있으므로 구간을 복사해 두고 바로 버퍼에서 비운다
+        audio = self.buffer.slice_ms(start_time, end_time).copy()
+        self.buffer.consume_until_ms(end_time)
+        if not len(audio):
+            self._discard_speculation()
+            return
+        text_task = self.speculator.take(text) if self.speculator else None
+
+        # 실시간 대비 지연: 발화 끝 오디오를 STT 로 넘긴 시각부터 최종 결과까지
+        position = self.buffer.ms_to_samples(end_time)
+        while self._forwarded_at and self._forwarded_at[0][0] < position:
+            self._forwarded_at.popleft()
+        if self._forwarded_at:
+            self.metrics['stt_lag'].add(time.perf_counter() - self._forwarded_at[0][1])
+
+        utterance = Utterance(text, audio, end_time, text_task)
+        self.utterances += 1
+        if self._work_q.qsize() >= self.max_pending:
+            self.shed += 1
+            if text_task is not None:
+                text_task.cancel()
+            utterance.emotion.set_result('neutrality')
+        else:
+            self._work_q.put_nowait(utterance)
+        self._send_q.put_nowait(utterance)
+
+    async def _read_stt(self):
+        try:
+            async for resp in self.stt_client.decode(self._audio()):
+                for result in resp.results:
+                    if result.is_final:
+                        self._on_final(result)
+                    elif self.speculator is not None and result.alternatives:
+                        self.speculator.observe(result.alternatives[0].text, result.stability)
+        finally:
+            self._send_q.put_nowait(None)
+            for _ in range(self.analysis_workers):
+                self._work_q.put_nowait(None)
+
+    async def _emotion_worker(self):
+        while True:
+            utterance = await self._work_q.get()
+            if utterance is None:
+                return
+            started = time.perf_counter()
+            try:
+                emotion = await self.analyze(utterance.text, utterance.audio, utterance.text_task)
+            except Exception as e:
+                print(f"session {self.id}: analysis failed: {e}")
+                emotion = 'neutrality'
+            self.metrics['emotion'].add(time.perf_counter() - started)
+            utterance.emotion.set_result(emotion)
+
+    async def _send(self):
+        while True:
+            utterance = await self._send_q.get()
+            if utterance is None:
+                return
+            emotion = await utterance.emotion
+            await self.websocket.send_text(json.dumps({'text': utterance.text, "emotion": emotion}))
+            self.sent += 1
+            # 최종 STT 결과를 받은 뒤 클라이언트로 보낼 때까지
+            self.metrics['result'].add(time.perf_counter() - utterance.received)
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        ingest = loop.create_task(self._ingest())
+        stages = [loop.create_task(self._read_stt()), loop.create_task(self._send())]
+        stages += [loop.create_task(self._emotion_worker()) for _ in range(self.analysis_workers)]
+        try:
+            await asyncio.gather(*stages)
+        finally:
+            for task in [ingest] + stages:
+                task.cancel()
+            if self.speculator is not None:
+                self.speculator.close()
+
+    def stats(self):
+        return {
+            "id": self.id,
+            "seconds": round(time.time() - self.started_at, 1),
+            "utterances": self.utterances,
+            "pending": self.pending,
+            "shed": self.shed,
+            "audio_queue": self._audio_q.qsize(),
+            "analysis_queue": self._work_q.qsize(),
+            "buffered_ms": len(self.buffer) * 1000 // self.buffer.sample_rate,
+            "dropped_samples": self.buffer.dropped,
+        }
+
+
+# 워커의 스트림 세션 목록
+# 세션마다 고정 크기 링 버퍼를 잡으므로 전체 버퍼 메모리가 max_buffer_bytes 를 넘는 세션은 받지 않는다.
+class SessionManager:
+    STAGES = ('ingest', 'stt_lag', 'emotion', 'result')
+
+    def __init__(self, stt_client, analyze, sample_rate=16000, capacity_ms=30000,
+                 max_buffer_bytes=64 << 20, max_pending=2, analysis_workers=2, audio_queue=50,
+                 text_stage=None, speculative_threshold=0.8, vad=None):
+        self.stt_client = stt_client
+        self.analyze = analyze
+        self.sample_rate = sample_rate
+        self.capacity_ms = capacity_ms
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_pending = max_pending
+        self.analysis_workers = analysis_workers
+        self.audio_queue = audio_queue
+        self.metrics = {stage: StageStats() for stage in self.STAGES}
+        # text_stage(text) 를 주면 중간 결과 기반 추측 실행을 켠다
+        self.text_stage = text_stage
+        self.speculative_threshold = speculative_threshold
+        self.speculation = SpeculationStats()
+        # vad: VoiceGate 설정 (dict). None 이면 받은 오디오를 그대로 보낸다
+        self.vad = vad
+        self.vad_stats = VadStats()
+        self.sessions = {}
+        self.reserved_bytes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.shed = 0
+        self.peak = 0
+        self._ids = itertools.count(1)
+
+    def _session_bytes(self):
+        # PcmRingBuffer 는 capacity 의 두 배(미러)를 int16 으로 잡는다
+        return self.sample_rate * self.capacity_ms // 1000 * 2 * 2
+
+    def open(self, websocket):
+        size = self._session_bytes()
+        if self.reserved_bytes + size > self.max_buffer_bytes:
+            self.rejected += 1
+            raise SessionLimitExceeded(f"audio buffer budget exhausted ({len(self.sessions)} sessions)")
+        session = StreamSession(next(self._ids), websocket, self.stt_client, self.analyze, self.metrics,
+                                self.sample_rate, self.capacity_ms, self.max_pending,
+                                self.analysis_workers, self.audio_queue, self._speculator(),
+                                VoiceGate(self.vad_stats, self.sample_rate, **self.vad) if self.vad is not None else None)
+        self.sessions[session.id] = session
+        self.reserved_bytes += session.buffer.nbytes
+        self.opened += 1
+        self.peak = max(self.peak, len(self.sessions))
+        return session
+
+    def _speculator(self):
+        if self.text_stage is None:
+            return None
+        return Speculator(self.text_stage, self.speculation, threshold=self.speculative_threshold)
+
+    def close(self, session):
+        if self.sessions.pop(session.id, None) is not None:
+            self.reserved_bytes -= session.buffer.nbytes
+            self.shed += session.shed
+
+    def stats(self):
+        sessions = [session.stats() for session in self.sessions.values()]
+        return {
+            "active": len(sessions),
+            "peak": self.peak,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "shed": self.shed + sum(s["shed"] for s in sessions),
+            "max_sessions": self.max_buffer_bytes // self._session_bytes(),
+            "reserved_bytes": self.reserved_bytes,
+            "max_buffer_bytes": self.max_buffer_bytes,
+            "pending_analyses": sum(s["pending"] for s in sessions),
+            "stages": {stage: stats.snapshot() for stage, stats in self.metrics.items()},
+            "speculation": self.speculation.snapshot() if self.text_stage is not None else None,
+            "vad": self.vad_stats.snapshot() if self.vad is not None else None,
+            "sessions": sessions,
+        }
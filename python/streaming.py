@@ -0,0 +1,61 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+
+STREAM_BATCH_SIZE = 500
+
+
+def row_to_dict(row):
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+
+def _dumps(item):
+    return json.dumps(jsonable_encoder(item), ensure_ascii=False)
+
+
+# 서버 측 커서로 행을 읽으면서 바로 내보낸다 (전체 결과를 메모리에 올리지 않음)
+# query 는 정렬된 select 문이고, 스트리밍 전용 세션은 응답이 끝나면 닫는다
+# (요청 단위 세션은 응답 본문을 보내기 전에 닫히므로 따로 연다).
+async def _iter_rows(session_factory, query):
+    async with session_factory() as session:
+        result = await session.stream(query.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for row in result.scalars():
+            yield row
+
+
+async def _json_array(rows, serialize):
+    yield b'['
+    first = True
+    async for row in rows:
+        chunk = _dumps(serialize(row))
+        yield (chunk if first else ',' + chunk).encode('utf-8')
+        first = False
+    yield b']'
+
+
+async def _ndjson(rows, serialize):
+    async for row in rows:
+        yield (_dumps(serialize(row)) + '\n').encode('utf-8')
+
+
+# format: json (기존과 같은 JSON 배열을 chunked 로) / ndjson (한 줄에 한 행)
+def stream_rows(session_factory, query, serialize=row_to_dict, format='json'):
+    rows = _iter_rows(session_factory, query)
+    if format == 'ndjson':
+        return StreamingResponse(_ndjson(rows, serialize), media_type='application/x-ndjson')
+    return StreamingResponse(_json_array(rows, serialize), media_type='application/json')
+
+
+# 키셋 페이지네이션: key_column > after 인 행을 limit 개, 다음 페이지 커서와 함께 돌려준다
+async def keyset_page(session, query, key_column, after, limit, serialize=row_to_dict):
+    if after is not None:
+        query = query.where(key_column > after)
+    rows = (await session.execute(query.order_by(key_column).limit(limit + 1))).scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": [serialize(row) for row in rows],
+        "next_cursor": getattr(rows[-1], key_column.key) if has_more else None,
+    }
@@ -0,0 +1,196 @@
+import asyncio
+import time
+
+
+def stt_modules():
+    import grpc
+    import vito_stt_client_pb2 as pb
+    import vito_stt_client_pb2_grpc as pb_grpc
+    return grpc, pb, pb_grpc
+
+
+class _Replay:
+    def __init__(self, limit):
+        self.limit = limit
+        self.chunks = []
+        self.nbytes = 0
+        self.enabled = True
+
+    def add(self, chunk):
+        if not self.enabled:
+            return
+        self.chunks.append(chunk)
+        self.nbytes += len(chunk)
+        if self.nbytes > self.limit:
+            self.disable()
+
+    def disable(self):
+        self.enabled = False
+        self.chunks = []
+        self.nbytes = 0
+
+
+# VITO 스트리밍 STT 클라이언트 (워커당 하나)
+# 채널 하나를 keepalive 와 함께 계속 열어 두고 모든 /ws 세션이 HTTP/2 스트림으로 나눠 쓴다.
+# 토큰은 만료 refresh_margin 초 전에 백그라운드에서 미리 갱신한다.
+# 첫 응답을 받기 전에 UNAUTHENTICATED(토큰 만료) / UNAVAILABLE(끊긴 채널) 로 실패하면
+# 토큰 또는 채널을 새로 만들고 그때까지 보낸 오디오를 처음부터 다시 보낸다
+# (같은 오디오를 다시 보내므로 STT 타임스탬프와 링 버퍼의 위치가 그대로 맞는다).
+class SttClient:
+    def __init__(self, target, token_cache, sample_rate=16000, use_itn=True,
+                 keepalive_ms=30000, keepalive_timeout_ms=10000, max_retries=2,
+                 replay_bytes=1 << 20, queue_size=64):
+        self.target = target
+        self.token_cache = token_cache
+        self.sample_rate = sample_rate
+        self.use_itn = use_itn
+        self.keepalive_ms = keepalive_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.max_retries = max_retries
+        self.replay_bytes = replay_bytes
+        self.queue_size = queue_size
+        self._channel = None
+        self._stub = None
+        self._refresh_task = None
+        self.channels_opened = 0
+        self.sessions = 0
+        self.active = 0
+        self.auth_retries = 0
+        self.reconnects = 0
+        self.failures = 0
+        self.first_response_total = 0.0
+        self.first_responses = 0
+
+    def _options(self):
+        return [
+            ('grpc.keepalive_time_ms', self.keepalive_ms),
+            ('grpc.keepalive_timeout_ms', self.keepalive_timeout_ms),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.http2.max_pings_without_data', 0),
+        ]
+
+    def _get_stub(self):
+        if self._stub is None:
+            grpc, _, pb_grpc = stt_modules()
+            self._channel = grpc.aio.secure_channel(self.target, grpc.ssl_channel_credentials(),
+                                                    options=self._options())
+            self._stub = pb_grpc.OnlineDecoderStub(self._channel)
+            self.channels_opened += 1
+        return self._stub
+
+    # 채널 연결(TCP + TLS + HTTP/2)과 토큰을 미리 준비한다
+    async def connect(self, timeout=10):
+        self._get_stub()
+        await self.token_cache.get()
+        await asyncio.wait_for(self._channel.channel_ready(), timeout)
+
+    async def _reset(self):
+        channel, self._channel, self._stub = self._channel, None, None
+        if channel is not None:
+            await channel.close()
+
+    async def _pump(self, chunks, queue):
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+        except Exception as e:
+            print(f"stt audio source failed: {e}")
+        await queue.put(None)
+
+    async def _requests(self, queue, replay):
+        _, pb, _ = stt_modules()
+        config = pb.DecoderConfig(sample_rate=self.sample_rate, use_itn=self.use_itn)
+        yield pb.DecoderRequest(streaming_config=config)
+        for chunk in list(replay.chunks):
+            yield pb.DecoderRequest(audio_content=chunk)
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                # 재시도할 때도 스트림 끝을 알 수 있도록 다시 넣어 둔다
+                queue.put_nowait(None)
+                return
+            replay.add(chunk)
+            yield pb.DecoderRequest(audio_content=chunk)
+
+    # chunks: PCM 바이트 비동기 이터레이터 -> DecoderResponse 비동기 이터레이터
+    async def decode(self, chunks):
+        grpc, _, _ = stt_modules()
+        retryable = (grpc.StatusCode.UNAUTHENTICATED, grpc.StatusCode.UNAVAILABLE)
+        queue = asyncio.Queue(self.queue_size)
+        pump = asyncio.get_running_loop().create_task(self._pump(chunks, queue))
+        replay = _Replay(self.replay_bytes)
+        attempts = 0
+        call = None
+        self.sessions += 1
+        self.active += 1
+        try:
+            while True:
+                token = await self.token_cache.get()
+                started = time.perf_counter()
+                call = self._get_stub().Decode(self._requests(queue, replay),
+                                               metadata=(('authorization', 'Bearer ' + token),))
+                try:
+                    async for resp in call:
+                        if replay.enabled:
+                            replay.disable()
+                            self.first_responses += 1
+                            self.first_response_total += time.perf_counter() - started
+                        yield resp
+                    return
+                except grpc.aio.AioRpcError as e:
+                    if e.code() not in retryable or not replay.enabled or attempts >= self.max_retries:
+                        self.failures += 1
+                        raise
+                    attempts += 1
+                    if e.code() == grpc.StatusCode.UNAUTHENTICATED:
+                        self.auth_retries += 1
+                        await self.token_cache.invalidate()
+                    else:
+                        self.reconnects += 1
+                        await self._reset()
+                    print(f"stt retry ({e.code().name}), attempt {attempts}")
+        finally:
+            self.active -= 1
+            pump.cancel()
+            if call is not None:
+                call.cancel()
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.token_cache.get()
+                delay = self.token_cache.expires_at - self.token_cache.refresh_margin - time.time()
+                if delay <= 0:
+                    await self.token_cache.refresh()
+                    delay = self.token_cache.expires_at - self.token_cache.refresh_margin - time.time()
+            except Exception as e:
+                print(f"stt token refresh failed: {e}")
+                delay = 30
+            await asyncio.sleep(max(delay, 30))
+
+    def start(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self._reset()
+
+    def stats(self):
+        state = None
+        if self._channel is not None:
+            state = self._channel.get_state().name
+        return {
+            "target": self.target,
+            "channel_state": state,
+            "channels_opened": self.channels_opened,
+            "sessions": self.sessions,
+            "active": self.active,
+            "auth_retries": self.auth_retries,
+            "reconnects": self.reconnects,
+            "failures": self.failures,
+            "avg_first_response_ms": self.first_response_total / self.first_responses * 1000 if self.first_responses else None,
+            "token": self.token_cache.stats(),
+        }
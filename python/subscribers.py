@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+
+# Push_alert 구독자 캐시 (token -> (uuid, permission))
+# 처음 한 번 DB 에서 읽고, 토큰 등록/권한 변경은 write-through 로 반영한다.
+# 주기적으로 DB 와 다시 맞추며, 그때 캐시와 달랐던 토큰 수를 drift 로 기록한다.
+class SubscriberCache:
+    def __init__(self, load_fn, refresh_interval=300):
+        # load_fn() -> [(uuid, token, permission), ...] (코루틴 함수)
+        self.load_fn = load_fn
+        self.refresh_interval = refresh_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._pending = []   # 새로고침 중에 들어온 변경 (스냅샷 교체 후 다시 적용)
+        self.loaded_at = None
+        self.refreshes = 0
+        self.last_drift = None
+        self._task = None
+
+    async def refresh(self):
+        with self._lock:
+            self._refreshing = True
+            self._pending = []
+        try:
+            rows = await self.load_fn()
+        except Exception:
+            with self._lock:
+                self._refreshing = False
+            raise
+        entries = {token: (uuid, permission) for uuid, token, permission in rows}
+        with self._lock:
+            if self.loaded_at is not None:
+                changed = set(entries.items()) ^ set(self._entries.items())
+                self.last_drift = len({token for token, _ in changed})
+            self._entries = entries
+            for op, args in self._pending:
+                op(*args)
+            self._refreshing = False
+            self._pending = []
+            self.loaded_at = time.time()
+            self.refreshes += 1
+
+    async def ensure_loaded(self):
+        if self.loaded_at is None:
+            await self.refresh()
+
+    def _write(self, op, *args):
+        with self._lock:
+            op(*args)
+            if self._refreshing:
+                self._pending.append((op, args))
+
+    def _upsert(self, token, uuid, permission):
+        self._entries[token] = (uuid, permission)
+
+    def _set_permission(self, uuid, permission):
+        for token, (owner, _) in list(self._entries.items()):
+            if owner == uuid:
+                self._entries[token] = (owner, permission)
+
+    def _discard(self, tokens):
+        for token in tokens:
+            self._entries.pop(token, None)
+
+    def upsert(self, token, uuid, permission):
+        self._write(self._upsert, token, uuid, permission)
+
+    def set_permission(self, uuid, permission):
+        self._write(self._set_permission, uuid, permission)
+
+    def discard(self, tokens):
+        self._write(self._discard, list(tokens))
+
+    # 알림 허용(permission == 'yes') 토큰
+    async def tokens(self):
+        await self.ensure_loaded()
+        with self._lock:
+            return [token for token, (_, permission) in self._entries.items() if permission == 'yes']
+
+    async def all_tokens(self):
+        await self.ensure_loaded()
+        with self._lock:
+            return list(self._entries)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"subscriber refresh failed: {e}")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self):
+        with self._lock:
+            subscribed = sum(1 for _, permission in self._entries.values() if permission == 'yes')
+            size = len(self._entries)
+        return {
+            "size": size,
+            "subscribed": subscribed,
+            "loaded": self.loaded_at is not None,
+            "staleness_seconds": round(time.time() - self.loaded_at, 1) if self.loaded_at else None,
+            "refresh_interval": self.refresh_interval,
+            "refreshes": self.refreshes,
+            "last_drift": self.last_drift,
+        }
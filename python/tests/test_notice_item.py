@@ -0,0 +1,22 @@
+import json
+from datetime import datetime
+
+from models import Notice_board
+from notice_cache import notice_to_dict
+from streaming import _dumps
+
+
+def test_notice_to_dict_from_orm_row():
+    row = Notice_board(no=3, title="점검 안내", content=None, date=datetime(2024, 5, 1, 9, 30), file="data:image/png;base64,AAAA")
+
+    item = notice_to_dict(row)
+
+    assert item == {
+        "no": 3,
+        "title": "점검 안내",
+        "content": None,
+        "date": datetime(2024, 5, 1, 9, 30),
+        "file": "data:image/png;base64,AAAA",
+    }
+    # 스트리밍 응답과 같은 방식으로 직렬화된다
+    assert json.loads(_dumps(item))["date"] == "2024-05-01T09:30:00"
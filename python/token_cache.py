@@ -0,0 +1,85 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+
+def _to_epoch(expiry):
+    if isinstance(expiry, datetime):
+        # google-auth 는 tz 없는 UTC datetime 을 돌려준다
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return expiry.timestamp()
+    return float(expiry)
+
+
+# 만료 시간을 아는 액세스 토큰 캐시
+# fetch() 는 (token, 만료 시각) 을 돌려주는 동기 함수로 스레드에서 실행된다.
+# 만료 refresh_margin 초 전부터는 기존 토큰을 돌려주면서 백그라운드에서 갱신하고,
+# 동시에 여러 요청이 와도 갱신은 한 번만 실행된다.
+class TokenCache:
+    def __init__(self, fetch, refresh_margin=300, name='token'):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.name = name
+        self.token = None
+        self.expires_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+        self._refresh_task = None
+
+    def _valid(self, now):
+        return self.token is not None and now < self.expires_at
+
+    async def _refresh(self):
+        try:
+            token, expiry = await asyncio.to_thread(self.fetch)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            raise
+        self.token = token
+        self.expires_at = _to_epoch(expiry)
+        self.refreshes += 1
+        self.last_error = None
+        return token
+
+    def _start_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+            # 백그라운드 갱신 실패는 다음 요청에서 다시 시도한다
+            self._refresh_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._refresh_task
+
+    async def get(self):
+        now = time.time()
+        if self._valid(now):
+            self.hits += 1
+            if now >= self.expires_at - self.refresh_margin:
+                self._start_refresh()
+            return self.token
+
+        self.misses += 1
+        return await asyncio.shield(self._start_refresh())
+
+    # 만료 전에 미리 갱신 (기존 토큰은 갱신이 끝날 때까지 계속 쓸 수 있다)
+    async def refresh(self):
+        return await asyncio.shield(self._start_refresh())
+
+    # 서버가 토큰을 거부했을 때 (401 등) 강제로 갱신
+    async def invalidate(self):
+        self.expires_at = 0.0
+        return await self.get()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "expires_in": round(self.expires_at - time.time(), 1) if self.token else None,
+        }
@@ -0,0 +1,101 @@
+from collections import deque
+
+import numpy as np
+
+
+class VadStats:
+    def __init__(self):
+        self.bytes_in = 0
+        self.bytes_forwarded = 0
+        self.speech_frames = 0
+        self.silence_frames = 0
+        self.dropped_frames = 0
+
+    def snapshot(self):
+        return {
+            "bytes_in": self.bytes_in,
+            "bytes_forwarded": self.bytes_forwarded,
+            "bytes_saved": self.bytes_in - self.bytes_forwarded,
+            "saved_ratio": round(1 - self.bytes_forwarded / self.bytes_in, 3) if self.bytes_in else None,
+            "speech_frames": self.speech_frames,
+            "silence_frames": self.silence_frames,
+            "dropped_frames": self.dropped_frames,
+        }
+
+
+# 프레임별 에너지(dBFS) / 영교차율 (벡터 연산)
+def frame_features(frames):
+    samples = frames.astype(np.float32) / 32768.0
+    rms = np.sqrt(np.mean(samples * samples, axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-10))
+    signs = np.signbit(frames)
+    zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+    return db, zcr
+
+
+# STT 로 보내기 전 음성 구간 판별 (세션마다 하나)
+#
+# frame_ms 단위로 에너지가 energy_db 이상이고 영교차율이 zcr_max 이하(잡음이 아닌 유성음)이거나,
+# 에너지가 energy_db + loud_margin_db 이상이면 음성으로 본다.
+# 음성이 끝난 뒤 hangover_ms 동안은 계속 보내고, 침묵 구간은 앞의 max_silence_ms 만 보낸다
+# (STT 가 발화 끝을 알 수 있도록). 다시 음성이 시작되면 직전 preroll_ms 를 먼저 보낸다.
+#
+# 버린 침묵만큼 STT 가 보는 시간축이 줄어들기 때문에, 세션의 링 버퍼에는 원본이 아니라
+# 여기서 내보낸 오디오를 쌓아야 단어 타임스탬프로 자른 구간이 맞는다.
+class VoiceGate:
+    def __init__(self, stats, sample_rate=16000, frame_ms=20, energy_db=-50.0, zcr_max=0.25,
+                 loud_margin_db=10.0, hangover_ms=300, preroll_ms=200, max_silence_ms=600):
+        self.stats = stats
+        self.frame_len = sample_rate * frame_ms // 1000
+        self.energy_db = energy_db
+        self.zcr_max = zcr_max
+        self.loud_margin_db = loud_margin_db
+        self.hangover_frames = hangover_ms // frame_ms
+        self.max_silence_frames = max_silence_ms // frame_ms
+        self._preroll = deque(maxlen=preroll_ms // frame_ms)
+        self._pending = b''            # 프레임 하나가 안 되는 나머지 (홀수 바이트 포함)
+        self._hangover = 0
+        self._silence_run = self.max_silence_frames   # 시작 직후의 침묵은 보내지 않는다
+
+    def _is_speech(self, frames):
+        db, zcr = frame_features(frames)
+        return (db >= self.energy_db) & ((zcr <= self.zcr_max) | (db >= self.energy_db + self.loud_margin_db))
+
+    # PCM 청크를 받아서 STT 로 보낼 바이트를 돌려준다 (보낼 것이 없으면 b'')
+    def process(self, chunk):
+        self.stats.bytes_in += len(chunk)
+        data = self._pending + bytes(chunk)
+        frame_bytes = self.frame_len * 2
+        n = len(data) // frame_bytes
+        self._pending = data[n * frame_bytes:]
+        if n == 0:
+            return b''
+
+        frames = np.frombuffer(data, dtype='<i2', count=n * self.frame_len).reshape(n, self.frame_len)
+        speech = self._is_speech(frames)
+        self.stats.speech_frames += int(speech.sum())
+        self.stats.silence_frames += n - int(speech.sum())
+
+        out = []
+        for i in range(n):
+            frame = data[i * frame_bytes:(i + 1) * frame_bytes]
+            if speech[i]:
+                # 침묵 중에 보관해 둔 직전 오디오를 먼저 보낸다
+                out.extend(self._preroll)
+                self._preroll.clear()
+                self._hangover = self.hangover_frames
+                self._silence_run = 0
+                out.append(frame)
+            elif self._hangover > 0:
+                self._hangover -= 1
+                out.append(frame)
+            elif self._silence_run < self.max_silence_frames:
+                self._silence_run += 1
+                out.append(frame)
+            else:
+                if len(self._preroll) == self._preroll.maxlen:
+                    self.stats.dropped_frames += 1
+                self._preroll.append(frame)
+        forwarded = b''.join(out)
+        self.stats.bytes_forwarded += len(forwarded)
+        return forwarded
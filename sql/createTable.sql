@@ -4,4 +4,42 @@ CREATE TABLE cycleData (
     user_uuid VARCHAR(255) NOT NULL,
     tsv BLOB NOT NULL,
     PRIMARY KEY (file_uuid)
-);
\ No newline at end of file
+);
+
+CREATE TABLE notification_outbox (
+    id INT NOT NULL AUTO_INCREMENT,
+    title VARCHAR(100) NOT NULL,
+    body VARCHAR(255) NOT NULL,
+    audience VARCHAR(20) NOT NULL DEFAULT 'subscribers',
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts SMALLINT NOT NULL DEFAULT 0,
+    retry_tokens MEDIUMTEXT NULL,
+    sent_count INT NOT NULL DEFAULT 0,
+    failed_count INT NOT NULL DEFAULT 0,
+    last_error TEXT NULL,
+    created_at DATETIME NOT NULL,
+    next_attempt_at DATETIME NOT NULL,
+    sent_at DATETIME NULL,
+    PRIMARY KEY (id),
+    INDEX ix_notification_outbox_status_next (status, next_attempt_at)
+);
+
+CREATE TABLE noise_rollup (
+    granularity VARCHAR(4) NOT NULL,
+    bucket DATETIME NOT NULL,
+    label VARCHAR(20) NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    decibel_sum BIGINT NOT NULL DEFAULT 0,
+    decibel_min SMALLINT NOT NULL,
+    decibel_max SMALLINT NOT NULL,
+    PRIMARY KEY (granularity, bucket, label)
+);
+
+CREATE TABLE noise_rollup_histogram (
+    granularity VARCHAR(4) NOT NULL,
+    bucket DATETIME NOT NULL,
+    label VARCHAR(20) NOT NULL,
+    decibel SMALLINT NOT NULL,
+    count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (granularity, bucket, label, decibel)
+);
@@ -0,0 +1,12 @@
+-- realtime_log 측정 시각 컬럼 + 인덱스 추가
+ALTER TABLE realtime_log
+    ADD COLUMN logged_at DATETIME NULL,
+    ADD INDEX ix_realtime_log_logged_at (logged_at),
+    ADD INDEX ix_realtime_log_label_logged_at (label, logged_at);
+
+-- 기존 행 채우기 (기존 조회와 같은 위치의 문자열을 파싱)
+-- 위도/경도 자릿수가 달라 위치가 어긋난 행은 python noise_log.py backfill 로 채운다
+UPDATE realtime_log
+SET logged_at = STR_TO_DATE(SUBSTR(timemap, 22, 19), '%Y-%m-%d-%H:%i:%s')
+WHERE logged_at IS NULL
+  AND SUBSTR(timemap, 22, 19) REGEXP '^[0-9]{4}-[0-9]{2}-[0-9]{2}-[0-9]{2}:[0-9]{2}:[0-9]{2}$';